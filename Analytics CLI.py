@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 16:08:44 2026
+
+@author: ericl
+"""
+
+import time
+
+_start_time = time.perf_counter()
+
+import argparse
+import importlib.util
+import os
+import sys
+
+"""
+Command-line entry point for the four analyses. Every subcommand loads its script only when it is run, so pandas
+and the other heavy dependencies are only imported by the subcommand that needs them, and --help or a mistyped
+command returns at once. With --timings, the time spent on startup, on importing the script and on running the
+analysis is reported on stderr.
+
+Examples:
+    python "Analytics CLI.py" ftpi --input dataset.csv --offensive-metrics xG shots --compactness-metrics ppda
+    python "Analytics CLI.py" pbs --input actions.csv --output pbs.xlsx
+    python "Analytics CLI.py" roles --outfield "Liga F.xlsx" --gk "Liga F GK.xlsx"
+    python "Analytics CLI.py" roles-all-leagues --chunked --timings
+"""
+
+SCRIPTS = {
+    "ftpi": "FTPI calculation.py",
+    "pbs": "PBS calculation.py",
+    "roles": "Role ranking.py",
+    "roles-all-leagues": "Role ranking all leagues.py",
+}
+
+# Import one of the analysis scripts as a module, without running its usage section
+def load_script(command):
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), SCRIPTS[command])
+    spec = importlib.util.spec_from_file_location(command.replace("-", "_"), path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def _optional(value):
+    # "none" turns an option off, e.g. --shrinkage-group none
+    return None if value.lower() == "none" else value
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="Analytics CLI.py", description="Football analytics models.")
+    parser.add_argument("--timings", action="store_true", help="report startup, import and run time on stderr")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    # --timings is accepted after the subcommand as well. SUPPRESS keeps the subcommand from resetting it when it
+    # was given before the subcommand.
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--timings", action="store_true", default=argparse.SUPPRESS,
+                        help="report startup, import and run time on stderr")
+
+    ftpi = subparsers.add_parser("ftpi", parents=[common], help="Final Third Proficiency Index per match")
+    ftpi.add_argument("--input", default="dataset.csv", help="match dataset (csv)")
+    ftpi.add_argument("--output", default="final_data.xlsx", help="output Excel file")
+    ftpi.add_argument("--offensive-metrics", nargs="+", required=True, help="offensive output metric columns")
+    ftpi.add_argument("--compactness-metrics", nargs="+", required=True, help="compactness factor metric columns")
+    ftpi.add_argument("--weight-mode", choices=["correlation", "ridge", "elastic_net"], default="correlation")
+    ftpi.add_argument("--weights-cache", default=None, help="directory to cache ridge and elastic-net weights in")
+
+    pbs = subparsers.add_parser("pbs", parents=[common], help="Press Breaking Score per action")
+    pbs.add_argument("--input", default="dataset.csv", help="action dataset (csv)")
+    pbs.add_argument("--output", default="final_data_with_normalized_pbs.xlsx", help="output Excel file")
+    pbs.add_argument("--radius", type=float, default=10)
+    pbs.add_argument("--max-density-adjustment-factor", type=float, default=5)
+
+    roles = subparsers.add_parser("roles", parents=[common], help="role scores for a single league")
+    roles.add_argument("--outfield", default="Liga F.xlsx", help="outfield player dataset")
+    roles.add_argument("--gk", default="Liga F GK.xlsx", help="goalkeeper dataset")
+    roles.add_argument("--outfield-output", default="Role_scores_outfield_liga_f_details.xlsx")
+    roles.add_argument("--gk-output", default="Role_scores_gk_liga_f_details.xlsx")
+    roles.add_argument("--shrinkage-group", type=_optional, default="Pos", help='column to shrink towards, or "none"')
+
+    all_leagues = subparsers.add_parser("roles-all-leagues", parents=[common], help="league adjusted role scores for all leagues")
+    all_leagues.add_argument("--outfield", default="Outfield player data.xlsx", help="outfield player dataset")
+    all_leagues.add_argument("--gk", default="GK player data.xlsx", help="goalkeeper dataset")
+    all_leagues.add_argument("--league-metrics", default="Average league data.xlsx", help="league averages dataset")
+    all_leagues.add_argument("--baseline-league", default="Mean")
+    all_leagues.add_argument("--outfield-output", default=None)
+    all_leagues.add_argument("--gk-output", default=None)
+    all_leagues.add_argument("--chunked", action="store_true", help="score the player data in chunks")
+    all_leagues.add_argument("--chunksize", type=int, default=50_000)
+    all_leagues.add_argument("--shrinkage-group", type=_optional, default="League", help='column to shrink towards, or "none"')
+
+    return parser
+
+# Arguments of each script's main function, from the parsed command-line arguments
+def script_arguments(args):
+    if args.command == "ftpi":
+        return dict(input_path=args.input, output_path=args.output, offensive_metrics=args.offensive_metrics,
+                    compactness_metrics=args.compactness_metrics, weight_mode=args.weight_mode,
+                    weights_cache_dir=args.weights_cache)
+    if args.command == "pbs":
+        return dict(input_path=args.input, output_path=args.output, radius=args.radius,
+                    max_density_adjustment_factor=args.max_density_adjustment_factor)
+    if args.command == "roles":
+        return dict(outfield_path=args.outfield, gk_path=args.gk, outfield_output=args.outfield_output,
+                    gk_output=args.gk_output, shrinkage_group=args.shrinkage_group)
+    return dict(outfield_player_path=args.outfield, gk_player_path=args.gk, league_metrics_path=args.league_metrics,
+                baseline_league=args.baseline_league, outfield_output=args.outfield_output, gk_output=args.gk_output,
+                chunked=args.chunked, chunksize=args.chunksize, shrinkage_group=args.shrinkage_group)
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    startup_time = time.perf_counter() - _start_time
+
+    import_start = time.perf_counter()
+    script = load_script(args.command)
+    import_time = time.perf_counter() - import_start
+
+    run_start = time.perf_counter()
+    script.main(**script_arguments(args))
+    run_time = time.perf_counter() - run_start
+
+    if args.timings:
+        print(f"startup {startup_time * 1000:.1f} ms, import {import_time * 1000:.1f} ms, run {run_time:.2f} s",
+              file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
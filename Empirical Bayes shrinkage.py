@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Tue Oct 20 09:14:26 2026
+
+@author: ericl
+"""
+
+import numpy as np
+import pandas as pd
+
+# Shrink small-sample metrics towards their league or position mean before normalizing. A player's observed value
+# is modelled as their true value plus noise with variance sigma^2 / minutes, and true values within a group as
+# spread around the group mean with variance tau^2. Both variances are estimated per group and metric by the method
+# of moments (regressing the squared deviations from the group mean on 1 / minutes), and every value is pulled
+# towards the group mean by tau^2 / (tau^2 + sigma^2 / minutes), so players with few minutes are shrunk the most.
+
+# Sums per group that the shrinkage priors are estimated from. They can be added up over chunks of a dataset.
+def calculate_shrinkage_sums(df, metrics, group_column="League", minutes_column="Mins"):
+    """
+    Calculate the sums per group that calculate_shrinkage_priors needs, for all metrics at once.
+
+    Args:
+        df (pd.DataFrame): The player dataset, or a chunk of it.
+        metrics (list): Metrics to shrink.
+        group_column (str): Column to estimate the priors per (e.g. "League" or "Pos").
+        minutes_column (str): Column with minutes played.
+
+    Returns:
+        pd.DataFrame: Sums per group (rows) for every statistic and metric (columns).
+    """
+    values = df[metrics].astype(float)
+    minutes = df[minutes_column].astype(float).to_numpy()[:, None]
+
+    # Only players with minutes and a value for the metric are used in the estimates
+    valid = values.notna().to_numpy() & (minutes > 0)
+    x = np.where(valid, values.to_numpy(), 0.0)
+    w = np.where(valid, minutes, 0.0)
+    with np.errstate(divide="ignore"):
+        z = np.where(valid, 1 / minutes, 0.0)
+
+    stats = {"n": valid.astype(float), "w": w, "wx": w * x, "z": z, "zz": z * z,
+             "x": x, "xx": x * x, "zx": z * x, "zxx": z * x * x}
+    sums = pd.concat({name: pd.DataFrame(stat, columns=metrics, index=df.index) for name, stat in stats.items()}, axis=1)
+    return sums.groupby(df[group_column].to_numpy()).sum()
+
+# Estimate the prior mean and the two variances for every group and metric
+def calculate_shrinkage_priors(sums):
+    """
+    Estimate shrinkage priors by the method of moments from the sums of calculate_shrinkage_sums.
+
+    Args:
+        sums (pd.DataFrame): Group sums from calculate_shrinkage_sums, added up over all chunks of the dataset.
+
+    Returns:
+        pd.DataFrame: Prior mean ("mean"), spread of true values ("tau2") and noise per minute ("sigma2") for every
+        group (rows) and metric (columns).
+    """
+    with np.errstate(invalid="ignore", divide="ignore"):
+        n = sums["n"]
+        mean = sums["wx"] / sums["w"]
+
+        # Sums of the squared deviations d^2 = (x - mean)^2, and of d^2 / minutes
+        d2 = sums["xx"] - 2 * mean * sums["x"] + mean ** 2 * n
+        zd2 = sums["zxx"] - 2 * mean * sums["zx"] + mean ** 2 * sums["z"]
+
+        # Least squares fit of d^2 = tau^2 + sigma^2 / minutes
+        var_z = sums["zz"] / n - (sums["z"] / n) ** 2
+        cov_zd2 = zd2 / n - sums["z"] * d2 / n ** 2
+        sigma2 = (cov_zd2 / var_z).where(var_z > 0, 0.0).clip(lower=0)
+        tau2 = (d2 / n - sigma2 * sums["z"] / n).clip(lower=0)
+
+    return pd.concat({"mean": mean, "tau2": tau2, "sigma2": sigma2.fillna(0)}, axis=1)
+
+# Pull every metric towards its group prior in proportion to the player's minutes
+def shrink_metrics(df, priors, group_column="League", minutes_column="Mins"):
+    """
+    Apply empirical-Bayes shrinkage to the metrics in the priors, for all players and metrics at once.
+
+    Args:
+        df (pd.DataFrame): The player dataset.
+        priors (pd.DataFrame): Priors from calculate_shrinkage_priors.
+        group_column (str): Column the priors were estimated per (e.g. "League" or "Pos").
+        minutes_column (str): Column with minutes played.
+
+    Returns:
+        pd.DataFrame: Copy of the dataset with shrunk metrics.
+    """
+    metrics = list(priors["mean"].columns)
+    groups = df[group_column].to_numpy()
+    mean = priors["mean"].reindex(groups).to_numpy()
+    tau2 = priors["tau2"].reindex(groups).to_numpy()
+    sigma2 = priors["sigma2"].reindex(groups).to_numpy()
+    minutes = df[minutes_column].astype(float).to_numpy()[:, None]
+
+    # Share of the deviation from the prior mean that is kept: 1 without noise, 0 without minutes
+    with np.errstate(invalid="ignore", divide="ignore"):
+        kept = np.where(sigma2 == 0, 1.0, tau2 / (tau2 + sigma2 / np.clip(minutes, 0, None)))
+    kept = np.where(np.isnan(mean), 1.0, np.nan_to_num(kept, nan=1.0))
+
+    values = df[metrics].astype(float).to_numpy()
+    shrunk_df = df.copy()
+    shrunk_df[metrics] = np.where(np.isnan(mean), values, mean + kept * (values - mean))
+    return shrunk_df
+
+# Shrink the role metrics of a dataset that fits in memory
+def shrink_data(df, roles, group_column="League", minutes_column="Mins"):
+    """
+    Shrink every metric used by the roles towards its group prior (minutes played itself is left as it is).
+
+    Args:
+        df (pd.DataFrame): The player dataset.
+        roles (dict): Dictionary defining roles and their associated metrics with weights.
+        group_column (str): Column to estimate the priors per (e.g. "League" or "Pos").
+        minutes_column (str): Column with minutes played.
+
+    Returns:
+        pd.DataFrame: Copy of the dataset with shrunk metrics.
+    """
+    metrics = [metric for metric in {m for role_weights in roles.values() for m in role_weights} if metric != minutes_column]
+    sums = calculate_shrinkage_sums(df, metrics, group_column, minutes_column)
+    return shrink_metrics(df, calculate_shrinkage_priors(sums), group_column, minutes_column)
@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 11:02:37 2026
+
+@author: ericl
+"""
+
+import glob
+
+import numpy as np
+import pandas as pd
+
+"""
+Aggregation stage that builds the match dataset used by FTPI calculation.py from raw event data. Event files are
+streamed in chunks, and every chunk is reduced to one row per match and team in a single grouped pass with
+categorical keys: final third touches and the sums of the configured metrics. The partial sums are added up once
+all files have been read, since a match can be spread over several chunks or files. Field tilt is then the team's
+share of the final third touches in the match, and the opponent's values are taken from the other team in the match.
+With a goals column, the targets of the FTPI weights are added as well: "goals_scored" is the team's own sum of goals
+and "least_goals_allowed" is minus the opponent's sum, so that higher is better for both targets.
+
+The event data should have one row per event with a match id, the team making the event and the x coordinate of the
+event, measured in the team's attacking direction. The pitch length is 100 by default (e.g. Opta), so the final
+third starts at x = 66.7.
+"""
+
+# Reduce one chunk of events to partial sums per match and team
+def aggregate_event_chunk(events, metric_columns, match_column="match_id", team_column="team", x_column="x",
+                          touch_column=None, pitch_length=100):
+    """
+    Sum final third touches and metrics per match and team for a chunk of events.
+
+    Parameters:
+        events (pd.DataFrame): Chunk of event data.
+        metric_columns (list): Numeric event columns to sum (e.g. xG, shots or passes into the box).
+        match_column (str): Column with the match id.
+        team_column (str): Column with the team making the event.
+        x_column (str): Column with the x coordinate in the team's attacking direction.
+        touch_column (str): Boolean column flagging the events that count as touches. All events count if None.
+        pitch_length (float): Length of the pitch in the coordinates of x_column.
+
+    Returns:
+        pd.DataFrame: One row per match and team with final third touches and metric sums.
+    """
+    missing_columns = [col for col in [match_column, team_column, x_column] + metric_columns if col not in events.columns]
+    if missing_columns:
+        raise ValueError(f"Missing required columns in event data: {missing_columns}")
+
+    final_third = events[x_column].to_numpy() >= pitch_length * 2 / 3
+    if touch_column is not None:
+        final_third &= events[touch_column].fillna(False).to_numpy(dtype=bool)
+
+    chunk = pd.DataFrame({
+        match_column: events[match_column].astype("category"),
+        team_column: events[team_column].astype("category"),
+        "final_third_touches": final_third.astype(np.int64),
+    })
+    chunk[metric_columns] = events[metric_columns].fillna(0)
+
+    return chunk.groupby([match_column, team_column], observed=True, sort=False).sum().reset_index()
+
+# Stream event files and build the match dataset for the FTPI calculation
+def aggregate_events(event_files, metric_columns, match_column="match_id", team_column="team", x_column="x",
+                     touch_column=None, pitch_length=100, goals_column=None, chunksize=1_000_000):
+    """
+    Build one row per match and team with field tilt, opponent field tilt and the summed metrics of both teams.
+
+    Parameters:
+        event_files (list): Paths of event CSV files.
+        metric_columns (list): Numeric event columns to sum per match and team.
+        match_column (str): Column with the match id.
+        team_column (str): Column with the team making the event.
+        x_column (str): Column with the x coordinate in the team's attacking direction.
+        touch_column (str): Boolean column flagging the events that count as touches. All events count if None.
+        pitch_length (float): Length of the pitch in the coordinates of x_column.
+        goals_column (str): Numeric event column with the goals scored by an event (e.g. 1 for a goal, 0 otherwise).
+            Needed for the "goals_scored" and "least_goals_allowed" targets of FTPI calculation.py.
+        chunksize (int): Number of events read at a time.
+
+    Returns:
+        pd.DataFrame: Match dataset with "field_tilt", "opponent_field_tilt", the metric sums and, for every metric,
+        an "opponent_<metric>" column. With a goals column also "goals_scored" (the team's goals) and
+        "least_goals_allowed" (minus the opponent's goals, so higher means fewer goals allowed).
+    """
+    # The goals are summed like the metrics, but only end up in the dataset as the two targets
+    summed_columns = list(dict.fromkeys(metric_columns + ([goals_column] if goals_column else [])))
+    usecols = list(dict.fromkeys([match_column, team_column, x_column] + summed_columns + ([touch_column] if touch_column else [])))
+
+    partials = []
+    for event_file in event_files:
+        for events in pd.read_csv(event_file, usecols=usecols, chunksize=chunksize):
+            partials.append(aggregate_event_chunk(events, summed_columns, match_column, team_column, x_column,
+                                                  touch_column, pitch_length))
+    if not partials:
+        raise ValueError("No event data found.")
+
+    # Add up the partial sums of matches that were spread over several chunks or files
+    partials = pd.concat(partials, ignore_index=True)
+    partials[match_column] = partials[match_column].astype("category")
+    partials[team_column] = partials[team_column].astype("category")
+    matches = partials.groupby([match_column, team_column], observed=True).sum().reset_index()
+
+    if (matches.groupby(match_column, observed=True)[team_column].transform("size") != 2).any():
+        raise ValueError("Every match must have events for exactly two teams.")
+
+    # The opponent's values are the match totals minus the team's own values
+    value_columns = ["final_third_touches"] + summed_columns
+    match_totals = matches.groupby(match_column, observed=True)[value_columns].transform("sum")
+    opponent_values = match_totals - matches[value_columns]
+
+    matches["field_tilt"] = matches["final_third_touches"] / match_totals["final_third_touches"]
+    matches["opponent_field_tilt"] = opponent_values["final_third_touches"] / match_totals["final_third_touches"]
+    for metric in metric_columns:
+        matches[f"opponent_{metric}"] = opponent_values[metric]
+
+    if goals_column:
+        matches["goals_scored"] = matches[goals_column]
+        matches["least_goals_allowed"] = -opponent_values[goals_column]
+        if goals_column not in metric_columns:
+            matches = matches.drop(columns=goals_column)
+
+    return matches.drop(columns="final_third_touches")
+
+#%%
+# Usage
+
+def main(event_pattern="events/*.csv", output_path="dataset.csv", metric_columns=None, goals_column="goal"):
+    """
+    Build the match dataset from event files and export it as the input of FTPI calculation.py.
+
+    Parameters:
+        event_pattern (str): Glob pattern of the event files, for a league, a season or a single match.
+        output_path (str): CSV file the match dataset is written to.
+        metric_columns (list): Metrics to sum per match and team, should include the offensive and compactness
+            metrics used in the FTPI.
+        goals_column (str): Goals per event, for the goals_scored and least_goals_allowed targets of the FTPI weights.
+    """
+    event_files = sorted(glob.glob(event_pattern))
+
+    # Numeric columns of the event data, manually inputed
+    metric_columns = metric_columns or []
+
+    dataset = aggregate_events(event_files, metric_columns, goals_column=goals_column)
+    dataset.to_csv(output_path, index=False)
+
+    print(f"Match dataset exported successfully to {output_path}")
+
+
+if __name__ == "__main__":
+    main()
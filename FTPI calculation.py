@@ -5,9 +5,13 @@ Created on Sat Dec 14 17:47:22 2024
 @author: ericl
 """
 
+import hashlib
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
 import pandas as pd
 import numpy as np
-from scipy.stats import zscore
 
 # Training a model to fit weights in the offensive output-metric according to correlation to goals scored,
 # and weights to defensive compactness-metric according to correlation to least goals allowed.
@@ -36,7 +40,7 @@ def calculate_weights(data, metric_columns, target_column, normalize=True):
     
     # Adjust weights based on z-scores (if normalize=True)
     if normalize:
-        z_scores = {col: zscore(data[col]) for col in metric_columns}
+        z_scores = {col: (data[col] - data[col].mean()) / data[col].std(ddof=0) for col in metric_columns}
         weight_adjustments = {col: np.std(z_scores[col]) for col in metric_columns}
         
         adjusted_weights = {
@@ -52,6 +56,136 @@ def calculate_weights(data, metric_columns, target_column, normalize=True):
 
     return final_weights
 
+# Alternative to calculate_weights: fit the weights of all metrics jointly with a regularized regression against the
+# target, so that collinear metrics share their weight instead of each being counted on its own.
+
+def _ridge_path(X, y, alphas):
+    """
+    Ridge coefficients for every alpha from a single SVD of X. X and y are expected to be centered, X standardized.
+    Returns an array of shape (n_alphas, n_metrics).
+    """
+    U, s, Vt = np.linalg.svd(X, full_matrices=False)
+    Uty = U.T @ y
+    # b(alpha) = V diag(s / (s^2 + n*alpha)) U^T y, for all alphas at once
+    shrinkage = s / (s ** 2 + len(y) * alphas[:, None])
+    return (shrinkage * Uty) @ Vt
+
+def _elastic_net_path(X, y, alphas, l1_ratio, max_iter=1000, tol=1e-6):
+    """
+    Elastic-net coefficients for every alpha by coordinate descent, warm started from the previous alpha. X and y are
+    expected to be centered, X standardized. Returns an array of shape (n_alphas, n_metrics).
+    """
+    n_samples, n_metrics = X.shape
+    gram = X.T @ X / n_samples
+    Xty = X.T @ y / n_samples
+    coefs = np.zeros((len(alphas), n_metrics))
+    b = np.zeros(n_metrics)
+
+    # Solve from the strongest to the weakest penalty so every solution starts close to the next one
+    for i in np.argsort(alphas)[::-1]:
+        l1_penalty = alphas[i] * l1_ratio
+        l2_penalty = alphas[i] * (1 - l1_ratio)
+        for _ in range(max_iter):
+            max_change = 0.0
+            for j in range(n_metrics):
+                rho = Xty[j] - gram[j] @ b + gram[j, j] * b[j]
+                new_bj = np.sign(rho) * max(abs(rho) - l1_penalty, 0.0) / (gram[j, j] + l2_penalty)
+                max_change = max(max_change, abs(new_bj - b[j]))
+                b[j] = new_bj
+            if max_change < tol:
+                break
+        coefs[i] = b
+    return coefs
+
+def _regularization_path(X, y, alphas, l1_ratio):
+    # Standardize with the statistics of the data the path is fitted on
+    X_mean, X_std = X.mean(axis=0), X.std(axis=0)
+    X_std[X_std == 0] = 1
+    y_mean = y.mean()
+    X_scaled = (X - X_mean) / X_std
+    if l1_ratio == 0:
+        path = _ridge_path(X_scaled, y - y_mean, alphas)
+    else:
+        path = _elastic_net_path(X_scaled, y - y_mean, alphas, l1_ratio)
+    return path, X_mean, X_std, y_mean
+
+def _fold_errors(X, y, train_idx, test_idx, alphas, l1_ratio):
+    # Mean squared error on the held-out fold for every alpha
+    path, X_mean, X_std, y_mean = _regularization_path(X[train_idx], y[train_idx], alphas, l1_ratio)
+    predictions = ((X[test_idx] - X_mean) / X_std) @ path.T + y_mean
+    return ((predictions - y[test_idx, None]) ** 2).mean(axis=0)
+
+def _weights_cache_key(data, metric_columns, target_column, alphas, l1_ratio, n_folds, random_state):
+    dataset_hash = hashlib.sha256(
+        pd.util.hash_pandas_object(data[metric_columns + [target_column]], index=False).values.tobytes()
+    ).hexdigest()
+    settings = json.dumps([metric_columns, target_column, list(alphas), l1_ratio, n_folds, random_state])
+    return hashlib.sha256((dataset_hash + settings).encode()).hexdigest()
+
+def calculate_regularized_weights(data, metric_columns, target_column, l1_ratio=0.0, alphas=None, n_folds=5,
+                                  n_jobs=None, cache_dir=None, random_state=0):
+    """
+    Calculates weights for metrics by fitting them jointly in a ridge (l1_ratio=0) or elastic-net (0 < l1_ratio <= 1)
+    regression against the target. The whole regularization path is computed in one go (a single SVD for ridge),
+    the penalty alpha is chosen by K-fold cross-validation with the folds run in parallel, and the fitted weights
+    can be cached on disk by dataset hash, metric list and settings.
+
+    The coefficients are converted back to the scale of the raw metrics, since that is what they are multiplied
+    with in compute_offensive_output and compute_compactness_factor. Like calculate_weights, the absolute values are
+    normalized to sum to 1.
+
+    Parameters:
+        data (pd.DataFrame): Dataset with metrics and target variable.
+        metric_columns (list): List of metric column names.
+        target_column (str): Name of the target column (e.g., goals scored or least goals allowed).
+        l1_ratio (float): Share of the penalty that is L1. 0 gives ridge regression.
+        alphas (array-like): Penalty strengths to try. Defaults to 100 values between 1e-4 and 1e2.
+        n_folds (int): Number of cross-validation folds.
+        n_jobs (int): Number of folds fitted in parallel. Defaults to one per fold.
+        cache_dir (str): Directory for cached weights. No caching if None.
+        random_state (int): Seed for shuffling the rows into folds.
+
+    Returns:
+        dict: Dictionary of metrics with fitted weights.
+    """
+    if not 0 <= l1_ratio <= 1:
+        raise ValueError("l1_ratio must be between 0 and 1.")
+    if len(data) < n_folds:
+        raise ValueError("The dataset must have at least as many rows as there are cross-validation folds.")
+    alphas = np.logspace(-4, 2, 100) if alphas is None else np.asarray(alphas, dtype=float)
+
+    cache_path = None
+    if cache_dir is not None:
+        key = _weights_cache_key(data, metric_columns, target_column, alphas, l1_ratio, n_folds, random_state)
+        cache_path = os.path.join(cache_dir, f"{key}.json")
+        if os.path.exists(cache_path):
+            with open(cache_path) as f:
+                return json.load(f)["weights"]
+
+    X = data[metric_columns].to_numpy(dtype=float)
+    y = data[target_column].to_numpy(dtype=float)
+
+    # K-fold cross-validation over the full path, one fold per worker
+    folds = np.array_split(np.random.default_rng(random_state).permutation(len(y)), n_folds)
+    splits = [(np.concatenate(folds[:k] + folds[k + 1:]), folds[k]) for k in range(n_folds)]
+    with ThreadPoolExecutor(max_workers=n_jobs or n_folds) as executor:
+        fold_errors = list(executor.map(lambda split: _fold_errors(X, y, *split, alphas, l1_ratio), splits))
+    best_alpha = alphas[np.argmin(np.mean(fold_errors, axis=0))]
+
+    # Refit on all data with the selected alpha and convert back to the scale of the raw metrics
+    path, _, X_std, _ = _regularization_path(X, y, np.array([best_alpha]), l1_ratio)
+    coefficients = np.abs(path[0] / X_std)
+    if coefficients.sum() == 0:
+        raise ValueError("All coefficients were shrunk to zero. Try smaller alphas or a lower l1_ratio.")
+    weights = dict(zip(metric_columns, (coefficients / coefficients.sum()).tolist()))
+
+    if cache_path is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+        with open(cache_path, "w") as f:
+            json.dump({"alpha": float(best_alpha), "weights": weights}, f)
+
+    return weights
+
 def calculate_ftpi(offensive_output, compactness_factor, field_tilt):
     """
     Calculate the Final Third Productivity Index (FTPI).
@@ -110,55 +244,77 @@ def compute_compactness_factor(compactness_metrics_dict, opponent_field_tilt):
 #%%
 # Usage of the functions we have to calculate the final FTPI for a team or a match
 
-# Dataset for a league, a single team, multiple matches or a single match
-data = pd.read_csv("dataset.csv")
+def main(input_path="dataset.csv", output_path="final_data.xlsx", offensive_metrics=None, compactness_metrics=None,
+         weight_mode="correlation", weights_cache_dir=None):
+    """
+    Calculate the FTPI for every row of a dataset and export it to Excel.
 
-# Offensive output metrics
-offensive_metrics = [] # all offensive metrics of your choice included in the dataset, manually inputed
-offensive_weights = calculate_weights(data, offensive_metrics, 'goals_scored')
+    Parameters:
+        input_path (str): Dataset for a league, a single team, multiple matches or a single match.
+        output_path (str): Excel file the dataset with the FTPI columns is written to.
+        offensive_metrics (list): Offensive output metrics included in the dataset.
+        compactness_metrics (list): Compactness factor metrics included in the dataset.
+        weight_mode (str): How to fit the weights: "correlation" for calculate_weights, "ridge" or "elastic_net"
+            for calculate_regularized_weights.
+        weights_cache_dir (str): Directory to cache the ridge and elastic-net weights in. No caching if None.
+    """
+    data = pd.read_csv(input_path)
 
-# Compactness factor metrics
-compactness_metrics = [] # all compactness metrics of your choice included in the dataset, manually inputed
-compactness_weights = calculate_weights(data, compactness_metrics, 'least_goals_allowed')
+    # Offensive output and compactness factor metrics, all metrics of your choice included in the dataset
+    offensive_metrics = offensive_metrics or []
+    compactness_metrics = compactness_metrics or []
 
-results = []
+    if weight_mode == "correlation":
+        offensive_weights = calculate_weights(data, offensive_metrics, 'goals_scored')
+        compactness_weights = calculate_weights(data, compactness_metrics, 'least_goals_allowed')
+    else:
+        l1_ratio = 0.5 if weight_mode == "elastic_net" else 0.0
+        offensive_weights = calculate_regularized_weights(data, offensive_metrics, 'goals_scored', l1_ratio=l1_ratio,
+                                                          cache_dir=weights_cache_dir)
+        compactness_weights = calculate_regularized_weights(data, compactness_metrics, 'least_goals_allowed',
+                                                            l1_ratio=l1_ratio, cache_dir=weights_cache_dir)
+
+    results = []
+
+    for _, row in data.iterrows():
+        # Create the offensive metrics dictionary for the current row
+        offensive_metrics_dict = {
+            metric_name: (row[metric_name], offensive_weights[metric_name])
+            for metric_name in offensive_metrics
+        }
 
-for _, row in data.iterrows():
-    # Create the offensive metrics dictionary for the current row
-    offensive_metrics_dict = {
-        metric_name: (row[metric_name], offensive_weights[metric_name])
-        for metric_name in offensive_metrics
-    }
+        # Create the compactness metrics dictionary for the current row
+        compactness_metrics_dict = {
+            metric_name: (row[metric_name], compactness_weights[metric_name])
+            for metric_name in compactness_metrics
+        }
 
-    # Create the compactness metrics dictionary for the current row
-    compactness_metrics_dict = {
-        metric_name: (row[metric_name], compactness_weights[metric_name])
-        for metric_name in compactness_metrics
-    }
+        # Access field tilt and opponent field tilt for the current row
+        field_tilt = row["field_tilt"]
+        opponent_field_tilt = row["opponent_field_tilt"]
 
-    # Access field tilt and opponent field tilt for the current row
-    field_tilt = row["field_tilt"]
-    opponent_field_tilt = row["opponent_field_tilt"]
+        # Compute offensive output, compactness factor and ftpi by calling our functions
+        offensive_output = compute_offensive_output(offensive_metrics_dict)
+        compactness_factor = compute_compactness_factor(compactness_metrics_dict, opponent_field_tilt)
+        ftpi = calculate_ftpi(offensive_output, compactness_factor, field_tilt)
 
-    # Compute offensive output, compactness factor and ftpi by calling our functions
-    offensive_output = compute_offensive_output(offensive_metrics_dict)
-    compactness_factor = compute_compactness_factor(compactness_metrics_dict, opponent_field_tilt)
-    ftpi = calculate_ftpi(offensive_output, compactness_factor, field_tilt)
+        # Store the result for this row
+        results.append({"Compactness factor": compactness_factor, 
+                        "Offensive output": offensive_output, 
+                        "FTPI": ftpi})
 
-    # Store the result for this row
-    results.append({"Compactness factor": compactness_factor, 
-                    "Offensive output": offensive_output, 
-                    "FTPI": ftpi})
+    # Convert results into a DataFrame
+    results_df = pd.DataFrame(results)
 
-# Convert results into a DataFrame
-results_df = pd.DataFrame(results)
+    # Add the computed columns to the original dataset
+    final_data = pd.concat([data, results_df], axis=1)
 
-# Add the computed columns to the original dataset
-final_data = pd.concat([data, results_df], axis=1)
+    # Export to Excel
+    final_data.to_excel(output_path, index=False)
 
-# Export to Excel
-final_data.to_excel("final_data.xlsx", index=False)
+    print(f"Data exported successfully to {output_path}")
 
-print("Data exported successfully to final_data.xlsx")
 
+if __name__ == "__main__":
+    main()
 
@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 14:25:51 2026
+
+@author: ericl
+"""
+
+import os
+
+import pandas as pd
+
+"""
+Aggregation of the action-level Press Breaking Score to players, teams and matches. The actions are first reduced
+to one row per match, team, player and phase with the sums of PBS and its z-score components, the number of
+actions and the player's minutes in the match, in a single grouped reduction on categorical keys. Since it only holds
+sums, counts and minutes per match, this base table can be merged with the base table of new matches without going
+back to the actions or to older minutes data. Reports per player, team or
+match are rolled up from the base table, with sums, means, counts, per match values and per 90 values.
+"""
+
+PBS_COLUMNS = ["PBS", "z_line_break_value_daf", "z_possession_value_change", "z_opv"]
+
+# Levels the base table can be rolled up to, and the columns that identify a row at each level
+LEVEL_KEYS = {
+    "player": ["team", "player"],
+    "team": ["team"],
+    "match": ["match_id", "team"],
+    "player_match": ["match_id", "team", "player"],
+}
+
+# Reduce the actions to sums and counts per match, team, player and phase
+def aggregate_actions(actions, minutes=None, phase_column="phase", value_columns=PBS_COLUMNS):
+    """
+    Build the base table of PBS aggregates from action-level data, e.g. the output of PBS calculation.py.
+
+    Parameters:
+        actions (pd.DataFrame): Actions with "match_id", "team", "player", the phase column and the PBS columns.
+        minutes (pd.DataFrame): Minutes played with "match_id", "team", "player" and "minutes", for the matches of
+            the actions. Needed for the per 90 values of players.
+        phase_column (str): Column with the phase of play (e.g. build-up, transition). No split by phase if None.
+        value_columns (list): Columns to sum.
+
+    Returns:
+        pd.DataFrame: One row per match, team, player (and phase) with the summed values, an "Actions" count and
+        the player's "Minutes" in the match (repeated on every phase row of the match).
+    """
+    keys = LEVEL_KEYS["player_match"] + ([phase_column] if phase_column else [])
+    missing_columns = [col for col in keys + value_columns if col not in actions.columns]
+    if missing_columns:
+        raise ValueError(f"Missing required columns in action data: {missing_columns}")
+
+    grouped = actions[keys + value_columns].astype({key: "category" for key in keys}).groupby(keys, observed=True)
+    base = grouped[value_columns].sum()
+    base["Actions"] = grouped.size()
+    base = base.reset_index()
+
+    # Minutes are stored per match, so merged base tables keep the minutes of every match they hold
+    match_keys = LEVEL_KEYS["player_match"]
+    if minutes is not None:
+        played = minutes.groupby(match_keys)["minutes"].sum(min_count=1)
+        base["Minutes"] = played.reindex(pd.MultiIndex.from_frame(base[match_keys].astype(object))).to_numpy()
+    else:
+        base["Minutes"] = float("nan")
+    return base
+
+# Merge the base table of new matches into an existing base table
+def merge_aggregates(existing, new, phase_column="phase"):
+    """
+    Merge two base tables from aggregate_actions. Matches in the new table replace the same matches in the existing
+    table, actions and minutes alike, so re-processing a match does not count its actions or minutes twice.
+
+    Parameters:
+        existing (pd.DataFrame): Existing base table.
+        new (pd.DataFrame): Base table of new matches.
+        phase_column (str): Column with the phase of play, or None if the tables are not split by phase.
+
+    Returns:
+        pd.DataFrame: Merged base table.
+    """
+    if sorted(existing.columns) != sorted(new.columns):
+        raise ValueError("Both aggregates must have the same columns.")
+
+    # The categories of the two tables differ, so the keys are made categorical again after concatenating
+    keys = LEVEL_KEYS["player_match"] + ([phase_column] if phase_column else [])
+    existing = existing[~existing["match_id"].isin(new["match_id"])]
+    merged = pd.concat(
+        [table[new.columns].astype({key: object for key in keys}) for table in (existing, new)], ignore_index=True
+    )
+    return merged.astype({key: "category" for key in keys})
+
+# Roll the base table up to players, teams or matches, with means, per match and per 90 values
+def pbs_report(base, level="player", phase_column="phase", match_minutes=90):
+    """
+    Report PBS output per player, team or match, split by phase and in total (phase "All").
+
+    Parameters:
+        base (pd.DataFrame): Base table from aggregate_actions or merge_aggregates.
+        level (str): "player", "team", "match" (team per match) or "player_match".
+        phase_column (str): Column with the phase of play, or None if the base table is not split by phase.
+        match_minutes (float): Length of a match, used for the per 90 values of teams.
+
+    Returns:
+        pd.DataFrame: One row per level and phase with sums, means, counts, per match and per 90 values.
+    """
+    if level not in LEVEL_KEYS:
+        raise ValueError(f"level must be one of {list(LEVEL_KEYS)}.")
+    keys = LEVEL_KEYS[level]
+    value_columns = [col for col in PBS_COLUMNS if col in base.columns]
+
+    # Totals over all phases, and per phase if the base table is split by phase
+    totals = base.groupby(keys, observed=True)[value_columns + ["Actions"]].sum()
+    matches = base.groupby(keys, observed=True)["match_id"].nunique()
+    if phase_column:
+        by_phase = base.groupby(keys + [phase_column], observed=True)[value_columns + ["Actions"]].sum()
+        totals = pd.concat([totals.assign(**{phase_column: "All"}).set_index(phase_column, append=True), by_phase])
+
+    # Minutes played at this level: the stored minutes per match for players (once per match, not once per phase),
+    # the number of matches for teams
+    if level in ("player", "player_match"):
+        if "Minutes" not in base.columns or base["Minutes"].isna().all():
+            raise ValueError("Minutes played are needed for per 90 values of players, see aggregate_actions.")
+        per_match = base.drop_duplicates(LEVEL_KEYS["player_match"])
+        played = per_match.groupby(keys, observed=True)["Minutes"].sum(min_count=1)
+    else:
+        played = matches * match_minutes
+
+    report = totals.reset_index(level=phase_column) if phase_column else totals.copy()
+    report["Matches"] = matches.reindex(report.index)
+    report["Minutes"] = played.reindex(report.index)
+    for col in value_columns:
+        report[f"{col}_mean"] = report[col] / report["Actions"]
+        report[f"{col}_per_match"] = report[col] / report["Matches"]
+        report[f"{col}_per90"] = report[col] / report["Minutes"] * 90
+
+    return report.reset_index()
+
+#%%
+# Usage
+
+def main(actions_path="final_data_with_normalized_pbs.xlsx", minutes_path="minutes.csv",
+         aggregates_path="pbs_aggregates.parquet", output_path="pbs_aggregates.xlsx"):
+    """
+    Merge the PBS of new matches into the stored aggregates and export reports per player, team and match.
+
+    Parameters:
+        actions_path (str): Action-level PBS from PBS calculation.py, with match_id, team, player and phase columns.
+        minutes_path (str): Minutes played per player in the new matches, with match_id, team, player and minutes.
+        aggregates_path (str): Parquet file with the stored base table.
+        output_path (str): Excel file the reports are written to.
+    """
+    actions = pd.read_excel(actions_path)
+    minutes = pd.read_csv(minutes_path)
+
+    # Merge the new matches into the stored aggregates
+    base = aggregate_actions(actions, minutes)
+    if os.path.exists(aggregates_path):
+        base = merge_aggregates(pd.read_parquet(aggregates_path), base)
+    base.to_parquet(aggregates_path, index=False)
+
+    # Reports per player, team and match
+    with pd.ExcelWriter(output_path) as writer:
+        pbs_report(base, "player").to_excel(writer, sheet_name="Players", index=False)
+        pbs_report(base, "team").to_excel(writer, sheet_name="Teams", index=False)
+        pbs_report(base, "match").to_excel(writer, sheet_name="Matches", index=False)
+
+    print(f"PBS aggregates exported to {output_path}")
+
+
+if __name__ == "__main__":
+    main()
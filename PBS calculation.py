@@ -36,21 +36,28 @@ def calculate_pbs(row, radius=10, max_density_adjustment_factor=5):
     return line_break_value_daf, row["possession_value_change"], opv
 
 
-# Load dataset
-data = pd.read_csv("dataset.csv")
+def main(input_path="dataset.csv", output_path="final_data_with_normalized_pbs.xlsx", radius=10,
+         max_density_adjustment_factor=5):
+    # Load dataset
+    data = pd.read_csv(input_path)
 
-# Step 1: Compute individual components
-components = data.apply(calculate_pbs, axis=1, result_type="expand")
-components.columns = ["line_break_value_daf", "possession_value_change", "opv"]
+    # Step 1: Compute individual components
+    components = data.apply(calculate_pbs, axis=1, result_type="expand", radius=radius,
+                            max_density_adjustment_factor=max_density_adjustment_factor)
+    components.columns = ["line_break_value_daf", "possession_value_change", "opv"]
 
-# Step 2: Normalize components using z-scores
-z_scores = (components - components.mean()) / components.std()
-z_scores.columns = ["z_line_break_value_daf", "z_possession_value_change", "z_opv"]
+    # Step 2: Normalize components using z-scores
+    z_scores = (components - components.mean()) / components.std()
+    z_scores.columns = ["z_line_break_value_daf", "z_possession_value_change", "z_opv"]
 
-# Step 3: Calculate normalized PBS
-data["PBS"] = z_scores["z_line_break_value_daf"] + z_scores["z_possession_value_change"] + z_scores["z_opv"]
+    # Step 3: Calculate normalized PBS
+    data["PBS"] = z_scores["z_line_break_value_daf"] + z_scores["z_possession_value_change"] + z_scores["z_opv"]
 
-# Export updated dataset
-data_with_pbs = pd.concat([data, z_scores], axis=1)
-data_with_pbs.to_excel("final_data_with_normalized_pbs.xlsx", index=False)
-print("Updated dataset exported to final_data_with_normalized_pbs.xlsx")
+    # Export updated dataset
+    data_with_pbs = pd.concat([data, z_scores], axis=1)
+    data_with_pbs.to_excel(output_path, index=False)
+    print(f"Updated dataset exported to {output_path}")
+
+
+if __name__ == "__main__":
+    main()
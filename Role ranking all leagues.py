@@ -5,8 +5,13 @@ Created on Sat Dec 28 16:21:46 2024
 @author: ericl
 """
 
+import importlib.util
+import os
+from itertools import islice
+
+import numpy as np
 import pandas as pd
-from scipy.stats import zscore
+from openpyxl import load_workbook
 
 # Calculate adjustment factors for each league
 def calculate_adjustment_factors(data, baseline_league):
@@ -70,11 +75,11 @@ def calculate_role_score_with_adjustments(df, roles, adjustment_factors, baselin
         role_scores[role_name] = 0
 
         for metric, weight in metrics_weights.items():
-            # Adjust metrics using league-specific adjustment factors
-            adjusted_metric_values = df.apply(
-                lambda row: row[metric] * adjustment_factors.get(row["League"], {}).get(metric, 1),
-                axis=1
-            )
+            # Adjust metrics using league-specific adjustment factors, looked up once per league instead of per row
+            league_factors = {
+                league: adjustment_factors.get(league, {}).get(metric, 1) for league in df["League"].unique()
+            }
+            adjusted_metric_values = df[metric] * df["League"].map(league_factors)
             # Accumulate the weighted, adjusted metric values into the role score
             role_scores[role_name] += adjusted_metric_values * weight
 
@@ -85,8 +90,10 @@ def calculate_role_score_with_adjustments(df, roles, adjustment_factors, baselin
 
     return role_scores
 
-# Normalize the dataset using z-scores so that all metrics are comparable to each other in size
-def normalize_data(df, roles):
+# Normalize the dataset using z-scores so that all metrics are comparable to each other in size.
+# If normalization statistics are given (see calculate_normalization_stats), they are used instead of the
+# statistics of df itself, so that chunks of a larger dataset are normalized the same way as the whole dataset.
+def normalize_data(df, roles, stats=None):
     # Identify all relevant columns for all roles
     relevant_columns = set()
     for role_weights in roles.values():
@@ -102,20 +109,144 @@ def normalize_data(df, roles):
     
     # Apply z-score normalization to relevant columns
     normalized_df = df.copy()
-    normalized_df[relevant_columns] = df[relevant_columns].apply(zscore, axis=0, nan_policy='omit')
+    if stats is None:
+        normalized_df[relevant_columns] = df[relevant_columns].apply(lambda col: (col - col.mean()) / col.std(ddof=0))
+    else:
+        normalized_df[relevant_columns] = (
+            (df[relevant_columns].astype(float) - stats["mean"][relevant_columns]) / stats["std"][relevant_columns]
+        )
     return normalized_df
 
-# Usage
+# Empirical-Bayes shrinkage of small-sample metrics, shared by both role ranking scripts
+shrinkage_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Empirical Bayes shrinkage.py")
+spec = importlib.util.spec_from_file_location("empirical_bayes_shrinkage", shrinkage_path)
+shrinkage = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(shrinkage)
+calculate_shrinkage_sums = shrinkage.calculate_shrinkage_sums
+calculate_shrinkage_priors = shrinkage.calculate_shrinkage_priors
+shrink_metrics = shrinkage.shrink_metrics
+shrink_data = shrinkage.shrink_data
+
+# Chunked mode, for player pools that do not fit in memory (e.g. ten seasons of 40+ leagues). The player data is
+# read twice, one chunk at a time: the first pass computes the normalization statistics over all chunks, the
+# second pass normalizes, scores and writes every chunk. Only one chunk is held in memory at a time. With shrinkage,
+# an extra pass first estimates the shrinkage priors over all chunks.
+
+# Read a player dataset in chunks of rows
+def read_player_chunks(path, chunksize=50_000):
+    """
+    Read a player dataset one chunk at a time. Excel files are streamed row by row, so the whole sheet is never
+    loaded. Like pd.read_excel, the first sheet is read, whichever sheet the workbook was saved with as active.
+
+    Args:
+        path (str): Path of an .xlsx or .csv file.
+        chunksize (int): Number of players per chunk.
+
+    Yields:
+        pd.DataFrame: The next chunk of players.
+    """
+    if path.endswith(".csv"):
+        yield from pd.read_csv(path, chunksize=chunksize)
+        return
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = next(rows)
+        while True:
+            block = list(islice(rows, chunksize))
+            if not block:
+                break
+            yield pd.DataFrame(block, columns=header)
+    finally:
+        workbook.close()
+
+# First pass: z-score statistics of every role metric, combined over all chunks
+def calculate_normalization_stats(chunks, roles):
+    """
+    Calculate the mean and standard deviation of every metric used by the roles, one chunk at a time. The chunk
+    statistics are combined with the parallel variance formula, which gives the same values as z-scoring the
+    whole dataset at once (missing values are omitted, like in normalize_data).
+
+    Args:
+        chunks (iterable of pd.DataFrame): Chunks of the player dataset, e.g. from read_player_chunks.
+        roles (dict): Dictionary defining roles and their associated metrics with weights.
 
-# Load the player-level dataset
-outfield_player_data = pd.read_excel("Outfield player data.xlsx")
-gk_player_data = pd.read_excel("GK player data.xlsx")
+    Returns:
+        pd.DataFrame: Mean and standard deviation ("mean" and "std" columns) for every metric.
+    """
+    relevant_columns = list({metric for role_weights in roles.values() for metric in role_weights})
 
-# Load the league-level metrics dataset. Should contain league level averages for every metric used
-df_league_metrics = pd.read_excel("Average league data.xlsx")
+    count = pd.Series(0.0, index=relevant_columns)
+    mean = pd.Series(0.0, index=relevant_columns)
+    m2 = pd.Series(0.0, index=relevant_columns)
+    for chunk in chunks:
+        missing_columns = [col for col in relevant_columns if col not in chunk.columns]
+        if missing_columns:
+            raise ValueError(f"Missing required columns for normalization: {missing_columns}")
 
-# Define the baseline league
-baseline_league = "Mean"
+        values = chunk[relevant_columns].astype(float)
+        chunk_count = values.count()
+        chunk_mean = values.mean().fillna(0)
+        chunk_m2 = ((values - chunk_mean) ** 2).sum()
+
+        # Combine the running statistics with the statistics of this chunk
+        total = count + chunk_count
+        delta = chunk_mean - mean
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = (mean + delta * chunk_count / total).where(total > 0, 0.0)
+            m2 = (m2 + chunk_m2 + delta ** 2 * count * chunk_count / total).where(total > 0, 0.0)
+        count = total
+
+    return pd.DataFrame({"mean": mean.where(count > 0), "std": np.sqrt(m2 / count)})
+
+# Second pass: normalize, score and write the player dataset one chunk at a time
+def calculate_role_scores_chunked(input_path, output_path, roles, adjustment_factors, baseline_league="Mean",
+                                  chunksize=50_000, shrinkage_group=None, minutes_column="Mins"):
+    """
+    Calculate role scores with league adjustments for a player dataset that is too large to hold in memory. The
+    results are the same as shrink_data (if shrinkage_group is given), normalize_data and
+    calculate_role_score_with_adjustments on the whole dataset.
+
+    Args:
+        input_path (str): Path of the player dataset (.xlsx or .csv).
+        output_path (str): Path of the .csv file the role scores are written to.
+        roles (dict): Dictionary defining roles and their associated metrics with weights.
+        adjustment_factors (dict of dict): Nested dictionary with league-specific adjustment factors for each metric.
+        baseline_league (str): The baseline league name.
+        chunksize (int): Number of players per chunk.
+        shrinkage_group (str): Column to estimate shrinkage priors per (e.g. "League"), like shrink_data.
+            No shrinkage if None.
+        minutes_column (str): Column with minutes played, used for shrinkage.
+
+    Returns:
+        int: Number of players scored.
+    """
+    priors = None
+    if shrinkage_group is not None:
+        metrics = [metric for metric in {m for role_weights in roles.values() for m in role_weights} if metric != minutes_column]
+        sums = None
+        for chunk in read_player_chunks(input_path, chunksize):
+            chunk_sums = calculate_shrinkage_sums(chunk, metrics, shrinkage_group, minutes_column)
+            sums = chunk_sums if sums is None else sums.add(chunk_sums, fill_value=0)
+        priors = calculate_shrinkage_priors(sums)
+
+    def chunks():
+        for chunk in read_player_chunks(input_path, chunksize):
+            yield chunk if priors is None else shrink_metrics(chunk, priors, shrinkage_group, minutes_column)
+
+    stats = calculate_normalization_stats(chunks(), roles)
+
+    n_players = 0
+    for i, chunk in enumerate(chunks()):
+        normalized_chunk = normalize_data(chunk, roles, stats)
+        chunk_scores = calculate_role_score_with_adjustments(normalized_chunk, roles, adjustment_factors, baseline_league)
+        chunk_scores.to_csv(output_path, mode="w" if i == 0 else "a", header=i == 0, index=False)
+        n_players += len(chunk_scores)
+
+    return n_players
+
+# Usage
 
 # Define the roles dictionary (use your predefined roles dictionary here)
 roles_outfield = {
@@ -345,19 +476,58 @@ roles_gk = {"Shot stopping distributor": {
     }
 }
 
-# Calculate adjustment factors for each league and each metric
-adjustment_factors = calculate_adjustment_factors(df_league_metrics, baseline_league)
+def main(outfield_player_path="Outfield player data.xlsx", gk_player_path="GK player data.xlsx",
+         league_metrics_path="Average league data.xlsx", baseline_league="Mean", outfield_output=None, gk_output=None,
+         chunked=False, chunksize=50_000, shrinkage_group="League"):
+    """
+    Calculate league adjusted role scores for the outfield players and goalkeepers of all leagues.
+
+    Parameters:
+        outfield_player_path (str): Outfield player dataset for all leagues.
+        gk_player_path (str): Goalkeeper dataset for all leagues.
+        league_metrics_path (str): League-level dataset. Should contain league level averages for every metric used.
+        baseline_league (str): The league every other league is adjusted to.
+        outfield_output (str): File for the outfield role scores. Defaults to an .xlsx file, or .csv when chunked.
+        gk_output (str): File for the goalkeeper role scores. Defaults to an .xlsx file, or .csv when chunked.
+        chunked (bool): Score the player data in chunks, for player pools that are too large to load at once.
+        chunksize (int): Number of players per chunk.
+        shrinkage_group (str): Column to shrink small-sample metrics towards the mean of ("League" or "Pos"),
+            None to use the raw metrics.
+    """
+    # Load the league-level metrics dataset. Should contain league level averages for every metric used
+    df_league_metrics = pd.read_excel(league_metrics_path)
+
+    # Calculate adjustment factors for each league and each metric
+    adjustment_factors = calculate_adjustment_factors(df_league_metrics, baseline_league)
+
+    print(adjustment_factors)
+
+    if chunked:
+        # Normalize and score the player data chunk by chunk, writing the results to csv as they are calculated
+        calculate_role_scores_chunked(outfield_player_path, outfield_output or "outfield_role_scores_with_adjustments.csv", roles_outfield, adjustment_factors, baseline_league, chunksize, shrinkage_group)
+        calculate_role_scores_chunked(gk_player_path, gk_output or "gk_role_scores_with_adjustments.csv", roles_gk, adjustment_factors, baseline_league, chunksize, shrinkage_group)
+    else:
+        # Load the player-level dataset
+        outfield_player_data = pd.read_excel(outfield_player_path)
+        gk_player_data = pd.read_excel(gk_player_path)
+
+        # Shrink small-sample metrics towards their group mean
+        if shrinkage_group is not None:
+            outfield_player_data = shrink_data(outfield_player_data, roles_outfield, shrinkage_group)
+            gk_player_data = shrink_data(gk_player_data, roles_gk, shrinkage_group)
+
+        # Normalize player data
+        normalized_outfield_data = normalize_data(outfield_player_data, roles_outfield)
+        normalized_gk_data = normalize_data(gk_player_data, roles_gk)
 
-print(adjustment_factors)
+        # Calculate role scores with adjustment factors for every player in the normalized player data
+        outfield_role_scores = calculate_role_score_with_adjustments(normalized_outfield_data, roles_outfield, adjustment_factors, baseline_league)
+        gk_role_scores = calculate_role_score_with_adjustments(normalized_gk_data, roles_gk, adjustment_factors, baseline_league)
 
-# Normalize player data
-normalized_outfield_data = normalize_data(outfield_player_data, roles_outfield)
-normalized_gk_data = normalize_data(gk_player_data, roles_gk)
+        # Save the results to a new Excel file
+        outfield_role_scores.to_excel(outfield_output or "outfield_role_scores_with_adjustments.xlsx", index=False)
+        gk_role_scores.to_excel(gk_output or "gk_role_scores_with_adjustments.xlsx", index=False)
 
-# Calculate role scores with adjustment factors for every player in the normalized player data
-outfield_role_scores = calculate_role_score_with_adjustments(normalized_outfield_data, roles_outfield, adjustment_factors, baseline_league)
-gk_role_scores = calculate_role_score_with_adjustments(normalized_gk_data, roles_gk, adjustment_factors, baseline_league)
 
-# Save the results to a new Excel file
-outfield_role_scores.to_excel("outfield_role_scores_with_adjustments.xlsx", index=False)
-gk_role_scores.to_excel("gk_role_scores_with_adjustments.xlsx", index=False)
\ No newline at end of file
+if __name__ == "__main__":
+    main()
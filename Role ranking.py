@@ -4,12 +4,10 @@ Created on Fri Dec 27 12:12:42 2024
 
 @author: ericl
 """
-import pandas as pd
-from scipy.stats import zscore
+import importlib.util
+import os
 
-# Dataset for your league
-df_outfield = pd.read_excel('Liga F.xlsx')  
-df_gk = pd.read_excel('Liga F GK.xlsx')
+import pandas as pd
 
 # Define the weights for different roles
 roles_outfield = {
@@ -255,9 +253,19 @@ def normalize_data(df, roles):
     
     # Apply z-score normalization to relevant columns
     normalized_df = df.copy()
-    normalized_df[relevant_columns] = df[relevant_columns].apply(zscore, axis=0, nan_policy='omit')
+    normalized_df[relevant_columns] = df[relevant_columns].apply(lambda col: (col - col.mean()) / col.std(ddof=0))
     return normalized_df
 
+# Empirical-Bayes shrinkage of small-sample metrics, shared by both role ranking scripts
+shrinkage_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Empirical Bayes shrinkage.py")
+spec = importlib.util.spec_from_file_location("empirical_bayes_shrinkage", shrinkage_path)
+shrinkage = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(shrinkage)
+calculate_shrinkage_sums = shrinkage.calculate_shrinkage_sums
+calculate_shrinkage_priors = shrinkage.calculate_shrinkage_priors
+shrink_metrics = shrinkage.shrink_metrics
+shrink_data = shrinkage.shrink_data
+
 # Function to calculate the weighted role score
 def calculate_role_score(df, role_weights):
     total_weight = sum(role_weights.values())
@@ -279,52 +287,75 @@ def calculate_role_score(df, role_weights):
 # List of columns to add
 additional_columns = ["Nation", "Pos", "Squad", "Age", "Born", "Mins"]
 
-# Process outfield players
-df_outfield_normalized = normalize_data(df_outfield, roles_outfield)
-role_scores_outfield = {}
-for role_name, role_weights in roles_outfield.items():
-    try:
-        role_scores_outfield[role_name] = calculate_role_score(df_outfield_normalized, role_weights)
-    except ValueError as e:
-        print(f"Error calculating {role_name} score: {e}")
-        role_scores_outfield[role_name] = None
+def main(outfield_path="Liga F.xlsx", gk_path="Liga F GK.xlsx", outfield_output="Role_scores_outfield_liga_f_details.xlsx",
+         gk_output="Role_scores_gk_liga_f_details.xlsx", shrinkage_group="Pos"):
+    """
+    Calculate role scores for the outfield players and goalkeepers of a league and export them to Excel.
+
+    Parameters:
+        outfield_path (str): Outfield player dataset for your league.
+        gk_path (str): Goalkeeper dataset for your league.
+        outfield_output (str): Excel file for the outfield role scores.
+        gk_output (str): Excel file for the goalkeeper role scores.
+        shrinkage_group (str): Column to shrink small-sample metrics towards the mean of, None to use the raw metrics.
+    """
+    # Dataset for your league
+    df_outfield = pd.read_excel(outfield_path)
+    df_gk = pd.read_excel(gk_path)
 
-# Create a dataset for outfield role scores
-role_scores_outfield_df = pd.DataFrame(role_scores_outfield)
-role_scores_outfield_df.insert(0, "Player", df_outfield["Player"])  # Add player names
+    # Process outfield players
+    df_outfield_shrunk = shrink_data(df_outfield, roles_outfield, shrinkage_group) if shrinkage_group else df_outfield
+    df_outfield_normalized = normalize_data(df_outfield_shrunk, roles_outfield)
+    role_scores_outfield = {}
+    for role_name, role_weights in roles_outfield.items():
+        try:
+            role_scores_outfield[role_name] = calculate_role_score(df_outfield_normalized, role_weights)
+        except ValueError as e:
+            print(f"Error calculating {role_name} score: {e}")
+            role_scores_outfield[role_name] = None
 
-# Add additional columns to outfield dataset
-for col in additional_columns:
-    if col in df_outfield.columns:  # Ensure the column exists in the original dataset
-        role_scores_outfield_df[col] = df_outfield[col]
+    # Create a dataset for outfield role scores
+    role_scores_outfield_df = pd.DataFrame(role_scores_outfield)
+    role_scores_outfield_df.insert(0, "Player", df_outfield["Player"])  # Add player names
 
-# Reorder columns in new outfield dataframe
-columns_order = ["Player"] + additional_columns + [col for col in role_scores_outfield_df.columns if col not in ["Player"] + additional_columns]
-role_scores_outfield_df = role_scores_outfield_df[columns_order]
+    # Add additional columns to outfield dataset
+    for col in additional_columns:
+        if col in df_outfield.columns:  # Ensure the column exists in the original dataset
+            role_scores_outfield_df[col] = df_outfield[col]
 
-# Process goalkeepers
-df_gk_normalized = normalize_data(df_gk, roles_gk)
-role_scores_gk = {}
-for role_name, role_weights in roles_gk.items():
-    try:
-        role_scores_gk[role_name] = calculate_role_score(df_gk_normalized, role_weights)
-    except ValueError as e:
-        print(f"Error calculating {role_name} score: {e}")
-        role_scores_gk[role_name] = None
+    # Reorder columns in new outfield dataframe
+    columns_order = ["Player"] + additional_columns + [col for col in role_scores_outfield_df.columns if col not in ["Player"] + additional_columns]
+    role_scores_outfield_df = role_scores_outfield_df[columns_order]
 
-# Create a dataset for GK role scores
-role_scores_gk_df = pd.DataFrame(role_scores_gk)
-role_scores_gk_df.insert(0, "Player", df_gk["Player"])  # Add player names
+    # Process goalkeepers
+    df_gk_shrunk = shrink_data(df_gk, roles_gk, shrinkage_group) if shrinkage_group else df_gk
+    df_gk_normalized = normalize_data(df_gk_shrunk, roles_gk)
+    role_scores_gk = {}
+    for role_name, role_weights in roles_gk.items():
+        try:
+            role_scores_gk[role_name] = calculate_role_score(df_gk_normalized, role_weights)
+        except ValueError as e:
+            print(f"Error calculating {role_name} score: {e}")
+            role_scores_gk[role_name] = None
 
-# Add additional columns to GK dataset
-for col in additional_columns:
-    if col in df_gk.columns:  # Ensure the column exists in the original dataset
-        role_scores_gk_df[col] = df_gk[col]
+    # Create a dataset for GK role scores
+    role_scores_gk_df = pd.DataFrame(role_scores_gk)
+    role_scores_gk_df.insert(0, "Player", df_gk["Player"])  # Add player names
+
+    # Add additional columns to GK dataset
+    for col in additional_columns:
+        if col in df_gk.columns:  # Ensure the column exists in the original dataset
+            role_scores_gk_df[col] = df_gk[col]
         
-# Reorder columns to GK dataset
-columns_order = ["Player"] + additional_columns + [col for col in role_scores_gk_df.columns if col not in ["Player"] + additional_columns]
-role_scores_gk_df = role_scores_gk_df[columns_order]
+    # Reorder columns to GK dataset
+    columns_order = ["Player"] + additional_columns + [col for col in role_scores_gk_df.columns if col not in ["Player"] + additional_columns]
+    role_scores_gk_df = role_scores_gk_df[columns_order]
+
+    # Dataframe to Excel
+    role_scores_outfield_df.to_excel(outfield_output)
+    role_scores_gk_df.to_excel(gk_output)
+
+
 
-# Dataframe to Excel
-role_scores_outfield_df.to_excel("Role_scores_outfield_liga_f_details.xlsx")
-role_scores_gk_df.to_excel("Role_scores_gk_liga_f_details.xlsx")
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,279 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 10:12:05 2026
+
+@author: ericl
+"""
+
+import os
+import uuid
+from urllib.parse import quote
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+"""
+Append-only history of role scores. Every run of the role ranking scripts is appended to a store on disk that is
+partitioned by season, matchweek and league, with one parquet file per partition and append. Next to the data the
+store keeps a player index (player id -> files holding that player), partitioned the same way, so a trajectory query
+only opens the files where the player appears and an append only reads the index of the partitions it writes to.
+The columns of all appends are merged into one store schema, so role sets and exported columns can change from one
+season to the next: older files simply have missing values for columns they do not have. Paths starting with "_" are
+ignored by the parquet dataset reader, which is why the index lives in "_player_index" and the schema in "_schema".
+"""
+
+PARTITION_COLUMNS = ["Season", "Matchweek", "League"]
+INDEX_DIRECTORY = "_player_index"
+SCHEMA_FILE = "_schema.parquet"
+PARTITIONING = ds.partitioning(pa.schema([(col, pa.string()) for col in PARTITION_COLUMNS]), flavor="hive")
+
+# Give every player a stable id so the same player can be followed across seasons, leagues and clubs
+def add_player_ids(df, id_columns=("Player", "Born")):
+    """
+    Add a "Player_id" column to the dataset if it does not already have one. The id is a hash of the player name
+    and year of birth, so it is the same in every run and every league.
+
+    Parameters:
+        df (pd.DataFrame): Role score dataset.
+        id_columns (tuple): Columns that together identify a player. Columns missing from the dataset are skipped.
+
+    Returns:
+        pd.DataFrame: Copy of the dataset with a "Player_id" column.
+    """
+    df = df.copy()
+    if "Player_id" in df.columns:
+        return df
+
+    key_columns = [col for col in id_columns if col in df.columns]
+    if not key_columns:
+        raise ValueError(f"DataFrame must contain at least one of {list(id_columns)} to create player ids.")
+
+    df.insert(0, "Player_id", pd.util.hash_pandas_object(df[key_columns].astype(str), index=False).astype("int64"))
+    return df
+
+# Directory of a season/matchweek/league partition, below the store or below the player index
+def _partition_dir(root, partition):
+    return os.path.join(root, *(f"{col}={quote(value, safe='')}" for col, value in zip(PARTITION_COLUMNS, partition)))
+
+# Schema of all data files in the store, with the partition columns added back
+def load_store_schema(store_path):
+    """
+    Load the schema of the store: every column that was ever appended, with the partition columns.
+
+    Parameters:
+        store_path (str): Root directory of the store.
+
+    Returns:
+        pa.Schema: Schema to read the data files with.
+    """
+    schema = pq.read_schema(os.path.join(store_path, SCHEMA_FILE))
+    return pa.unify_schemas([schema, PARTITIONING.schema])
+
+# Merge the columns of a new data file into the store schema
+def _update_store_schema(store_path, schema):
+    schema_path = os.path.join(store_path, SCHEMA_FILE)
+    if os.path.exists(schema_path):
+        schema = pa.unify_schemas([pq.read_schema(schema_path), schema], promote_options="permissive")
+    pq.write_table(schema.empty_table(), schema_path)
+
+# Append a role score table to the store, one new file per season/matchweek/league partition
+def append_role_scores(df, store_path, season, matchweek, league=None, if_exists="raise"):
+    """
+    Append role scores to the partitioned store. Existing files are never rewritten, so an append only costs
+    writing the new rows and their index entries. A player is stored at most once per season, matchweek and
+    league: players the player index already holds for a partition are either refused or skipped, so running the
+    same matchweek twice does not duplicate its scores. Numeric columns (role scores, metrics, minutes) are stored
+    as floats, so a column has the same type in every append.
+
+    Parameters:
+        df (pd.DataFrame): Role scores, e.g. the output of calculate_role_score_with_adjustments.
+        store_path (str): Root directory of the store.
+        season (str): Season of the scores (e.g. '2024-2025').
+        matchweek (int or str): Matchweek the scores were calculated after.
+        league (str): League of the scores. Only needed if the dataset has no "League" column.
+        if_exists (str): What to do with players already stored for the partition: "raise" raises a ValueError
+            and writes nothing, "skip" only appends the players that are not stored yet.
+
+    Returns:
+        list: Paths of the data files that were written.
+    """
+    if if_exists not in ("raise", "skip"):
+        raise ValueError("if_exists must be 'raise' or 'skip'.")
+
+    df = add_player_ids(df).reset_index(drop=True)
+    df["Season"] = str(season)
+    df["Matchweek"] = str(matchweek)
+    if "League" not in df.columns:
+        if league is None:
+            raise ValueError("A league must be given when the DataFrame has no 'League' column.")
+        df["League"] = league
+    df["League"] = df["League"].astype(str)
+
+    numeric_columns = [
+        col for col in df.columns
+        if col != "Player_id" and pd.api.types.is_numeric_dtype(df[col]) and not pd.api.types.is_bool_dtype(df[col])
+    ]
+    df[numeric_columns] = df[numeric_columns].astype("float64")
+
+    # Players that are already stored for their season, matchweek and league, from the index of those partitions only
+    index_dir = os.path.join(store_path, INDEX_DIRECTORY)
+    partitions = list(df.groupby(PARTITION_COLUMNS, sort=False))
+    already_stored = pd.Series(False, index=df.index)
+    for partition, partition_df in partitions:
+        partition_index_dir = _partition_dir(index_dir, partition)
+        if os.path.isdir(partition_index_dir):
+            stored_ids = pd.read_parquet(partition_index_dir, columns=["Player_id"])["Player_id"]
+            already_stored[partition_df.index] = partition_df["Player_id"].isin(stored_ids)
+    if already_stored.any():
+        if if_exists == "raise":
+            raise ValueError(
+                f"{already_stored.sum()} players are already stored for season {season}, matchweek {matchweek}. "
+                "Use if_exists='skip' to only append the other players."
+            )
+        partitions = [(partition, partition_df[~already_stored[partition_df.index]]) for partition, partition_df in partitions]
+
+    written_files = []
+    for partition, partition_df in partitions:
+        if partition_df.empty:
+            continue
+        partition_dir = _partition_dir(store_path, partition)
+        os.makedirs(partition_dir, exist_ok=True)
+        file_path = os.path.join(partition_dir, f"part-{uuid.uuid4().hex}.parquet")
+
+        # Partition values live in the directory names, so they are not stored in the file itself
+        table = pa.Table.from_pandas(partition_df.drop(columns=PARTITION_COLUMNS), preserve_index=False)
+        pq.write_table(table, file_path)
+        _update_store_schema(store_path, table.schema.remove_metadata())
+        written_files.append(file_path)
+
+        # The index is append-only as well: every append adds one small index file per partition
+        index_df = partition_df[["Player_id", "Player"]].drop_duplicates("Player_id")
+        index_df["File"] = os.path.relpath(file_path, store_path)
+        partition_index_dir = _partition_dir(index_dir, partition)
+        os.makedirs(partition_index_dir, exist_ok=True)
+        index_df.to_parquet(os.path.join(partition_index_dir, f"part-{uuid.uuid4().hex}.parquet"), index=False)
+
+    return written_files
+
+# Read the player index of the store
+def load_player_index(store_path):
+    """
+    Load the player index, with one row per player and data file.
+
+    Parameters:
+        store_path (str): Root directory of the store.
+
+    Returns:
+        pd.DataFrame: Index with the columns Player_id, Player, Season, Matchweek, League and File.
+    """
+    columns = ["Player_id", "Player"] + PARTITION_COLUMNS + ["File"]
+    index_dir = os.path.join(store_path, INDEX_DIRECTORY)
+    if not os.path.isdir(index_dir):
+        return pd.DataFrame(columns=columns)
+    return ds.dataset(index_dir, format="parquet", partitioning=PARTITIONING).to_table(columns=columns).to_pandas()
+
+# Read columns from a set of data files, with the partition values added back as columns
+def _read_files(store_path, files, columns=None, filter=None):
+    dataset = ds.dataset(
+        [os.path.join(store_path, file) for file in files],
+        schema=load_store_schema(store_path),
+        format="parquet",
+        partitioning=PARTITIONING,
+        partition_base_dir=store_path,
+    )
+    if columns is not None:
+        columns = list(dict.fromkeys(["Player_id", "Player"] + PARTITION_COLUMNS + list(columns)))
+    return dataset.to_table(columns=columns, filter=filter).to_pandas()
+# Follow one or more players through every season, matchweek and league in the store
+def player_trajectory(store_path, player, roles=None):
+    """
+    Get the history of role scores for a player. Only the files that contain the player, according to the
+    player index, are opened, and only the requested role columns are read.
+
+    Parameters:
+        store_path (str): Root directory of the store.
+        player (str, int or list): Player name(s) or player id(s).
+        roles (list): Role score columns to return (e.g. ['Progressive midfielder']). All columns if None.
+
+    Returns:
+        pd.DataFrame: One row per player and partition, sorted by season and matchweek.
+    """
+    players = player if isinstance(player, (list, tuple, set)) else [player]
+    index = load_player_index(store_path)
+    matches = index[index["Player_id"].isin(players) | index["Player"].isin(players)]
+    if matches.empty:
+        raise ValueError(f"No history found for {player}.")
+
+    player_ids = matches["Player_id"].unique().tolist()
+    trajectory = _read_files(
+        store_path, matches["File"].unique(), columns=roles, filter=ds.field("Player_id").isin(player_ids)
+    )
+
+    # Sort matchweeks numerically, not as the strings they are stored as
+    matchweek_order = pd.to_numeric(trajectory["Matchweek"], errors="coerce")
+    return (
+        trajectory.assign(_matchweek=matchweek_order)
+        .sort_values(["Player_id", "Season", "_matchweek"])
+        .drop(columns="_matchweek")
+        .reset_index(drop=True)
+    )
+
+# Query role scores across seasons, matchweeks and leagues
+def query_role_scores(store_path, roles=None, seasons=None, matchweeks=None, leagues=None):
+    """
+    Read role scores for a selection of seasons, matchweeks and leagues. Partitions outside the selection are
+    pruned on their directory names and never opened.
+
+    Parameters:
+        store_path (str): Root directory of the store.
+        roles (list): Role score columns to return. All columns if None.
+        seasons (list): Seasons to include. All seasons if None.
+        matchweeks (list): Matchweeks to include. All matchweeks if None.
+        leagues (list): Leagues to include. All leagues if None.
+
+    Returns:
+        pd.DataFrame: Role scores for the selected partitions.
+    """
+    selection = {"Season": seasons, "Matchweek": matchweeks, "League": leagues}
+    partition_filter = None
+    for col, values in selection.items():
+        if values is None:
+            continue
+        expression = ds.field(col).isin([str(value) for value in values])
+        partition_filter = expression if partition_filter is None else partition_filter & expression
+
+    dataset = ds.dataset(store_path, schema=load_store_schema(store_path), format="parquet", partitioning=PARTITIONING)
+    if roles is not None:
+        roles = list(dict.fromkeys(["Player_id", "Player"] + PARTITION_COLUMNS + list(roles)))
+    return dataset.to_table(columns=roles, filter=partition_filter).to_pandas()
+
+#%%
+# Usage
+
+def main(role_scores_path="outfield_role_scores_with_adjustments.xlsx", store_path="role_score_history",
+         season="2024-2025", matchweek=15):
+    """
+    Append the latest role scores to the history store and query it.
+
+    Parameters:
+        role_scores_path (str): Role scores of the latest run, from Role ranking all leagues.py.
+        store_path (str): Root directory of the store.
+        season (str): Season of the scores.
+        matchweek (int or str): Matchweek the scores were calculated after.
+    """
+    outfield_role_scores = pd.read_excel(role_scores_path)
+    append_role_scores(outfield_role_scores, store_path, season, matchweek, if_exists="skip")
+
+    # How has a player's Progressive midfielder score evolved across seasons?
+    trajectory = player_trajectory(store_path, "Aitana Bonmatí", roles=["Progressive midfielder"])
+    print(trajectory)
+
+    # Compare a role across seasons for one league
+    cross_season = query_role_scores(store_path, roles=["Progressive midfielder"], leagues=["Liga F"])
+    print(cross_season.groupby("Season")["Progressive midfielder"].describe())
+
+
+if __name__ == "__main__":
+    main()
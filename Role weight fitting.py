@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 18:47:30 2026
+
+@author: ericl
+"""
+
+import importlib.util
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+from scipy.optimize import nnls
+
+"""
+Learning role weights from players the scouts have labelled as archetypes of a role. For every role, the weights of
+its candidate metrics are fitted by non-negative least squares on the z-scored player data: the weighted sum of the
+metrics should be high for the exemplars and low for all other players. Exemplars and other players are weighted so
+both count equally, and the intercept is removed by centering. Since a role score only ranks players, scaling the
+weights does not change it, so the fitted weights are scaled to sum to 1 and can replace the hand-tuned ones in
+roles_outfield and roles_gk. All roles are solved as one batch of small problems, spread over a pool of threads.
+"""
+
+# Fit the weights of one role
+def fit_role(z_scores, is_exemplar, candidates):
+    """
+    Fit non-negative weights that sum to 1 for the candidate metrics of a role.
+
+    Parameters:
+        z_scores (pd.DataFrame): Z-scored player data, e.g. from normalize_data.
+        is_exemplar (np.ndarray): Boolean array marking the exemplar players of the role.
+        candidates (list): Candidate metrics of the role.
+
+    Returns:
+        dict: Weights of the metrics with a weight above zero, or None if no metric separates the exemplars.
+    """
+    X = z_scores[candidates].fillna(0).to_numpy()
+    y = is_exemplar.astype(float)
+
+    # Exemplars and other players get the same total weight, however few exemplars there are
+    sample_weights = np.where(is_exemplar, 0.5 / is_exemplar.sum(), 0.5 / (~is_exemplar).sum())
+    X_centered = X - sample_weights @ X
+    y_centered = y - sample_weights @ y
+    root_weights = np.sqrt(sample_weights)[:, None]
+
+    coefficients, _ = nnls(X_centered * root_weights, y_centered * root_weights[:, 0])
+    if coefficients.sum() == 0:
+        return None
+    weights = coefficients / coefficients.sum()
+    return {metric: float(weight) for metric, weight in zip(candidates, weights) if weight > 0}
+
+# Fit the weights of all roles with exemplars
+def fit_role_weights(z_scores, roles, exemplars, candidates=None, player_column="Player", n_jobs=None):
+    """
+    Learn role weights from exemplar players. Roles without exemplars, or where no candidate metric separates the
+    exemplars from the other players, keep their current weights, so the result is a complete roles dictionary.
+
+    Parameters:
+        z_scores (pd.DataFrame): Z-scored player data, e.g. normalize_data(df, roles).
+        roles (dict): Dictionary defining roles and their associated metrics with weights.
+        exemplars (dict): Exemplar players per role, e.g. {"Target striker": ["Player A", "Player B"]}.
+        candidates (dict): Candidate metrics per role. Defaults to the metrics each role already uses.
+        player_column (str): Column with the names the exemplars are given by.
+        n_jobs (int): Number of threads. Defaults to one per role.
+
+    Returns:
+        dict: Roles dictionary with learned weights that sum to 1, in the same format as roles.
+    """
+    candidates = candidates or {}
+    problems = {}
+    for role_name, role_players in exemplars.items():
+        if role_name not in roles:
+            raise ValueError(f"Unknown role: {role_name}")
+        role_candidates = list(candidates.get(role_name, roles[role_name]))
+        missing_columns = [col for col in role_candidates if col not in z_scores.columns]
+        if missing_columns:
+            raise ValueError(f"Missing required columns for {role_name}: {missing_columns}")
+
+        is_exemplar = z_scores[player_column].isin(role_players).to_numpy()
+        unknown_players = set(role_players) - set(z_scores.loc[is_exemplar, player_column])
+        if unknown_players:
+            print(f"Exemplars of {role_name} not found in dataset: {sorted(unknown_players)}")
+        if not is_exemplar.any() or is_exemplar.all():
+            print(f"Keeping current weights for {role_name}: no exemplars to fit on")
+            continue
+        problems[role_name] = (is_exemplar, role_candidates)
+
+    with ThreadPoolExecutor(max_workers=n_jobs or max(len(problems), 1)) as executor:
+        fitted = dict(zip(problems, executor.map(lambda args: fit_role(z_scores, *args), problems.values())))
+
+    learned_roles = {}
+    for role_name, role_weights in roles.items():
+        if fitted.get(role_name) is None:
+            if role_name in problems:
+                print(f"Keeping current weights for {role_name}: no candidate metric separates the exemplars")
+            learned_roles[role_name] = dict(role_weights)
+        else:
+            learned_roles[role_name] = fitted[role_name]
+    return learned_roles
+
+#%%
+# Usage
+
+# Load the functions and roles of the role ranking scripts
+def load_script(file_name, module_name):
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), file_name)
+    spec = importlib.util.spec_from_file_location(module_name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def main(player_path="Outfield player data.xlsx", exemplars_path="role_exemplars.json",
+         output_path="learned_roles_outfield.json", shrinkage_group="League"):
+    """
+    Learn outfield role weights from the scouts' exemplars and export them as JSON.
+
+    Parameters:
+        player_path (str): Outfield player dataset for all leagues.
+        exemplars_path (str): JSON file with the exemplar players per role, as listed by the scouts.
+        output_path (str): JSON file the learned roles are written to.
+        shrinkage_group (str): Column to shrink small-sample metrics towards the mean of, like the role ranking
+            scripts, so the weights are fitted on the same inputs they will score. None to use the raw metrics.
+    """
+    role_ranking_all_leagues = load_script("Role ranking all leagues.py", "role_ranking_all_leagues")
+    role_ranking = load_script("Role ranking.py", "role_ranking")
+    roles_outfield = role_ranking_all_leagues.roles_outfield
+
+    with open(exemplars_path) as f:
+        exemplars = json.load(f)
+
+    outfield_player_data = pd.read_excel(player_path)
+    if shrinkage_group is not None:
+        outfield_player_data = role_ranking_all_leagues.shrink_data(outfield_player_data, roles_outfield, shrinkage_group)
+    normalized_outfield_data = role_ranking_all_leagues.normalize_data(outfield_player_data, roles_outfield)
+
+    learned_roles_outfield = fit_role_weights(normalized_outfield_data, roles_outfield, exemplars)
+
+    # The learned weights pass the same checks as the hand-tuned ones
+    for role_name, role_weights in learned_roles_outfield.items():
+        role_ranking.calculate_role_score(normalized_outfield_data, role_weights)
+
+    with open(output_path, "w") as f:
+        json.dump(learned_roles_outfield, f, indent=4)
+
+    print(f"Learned role weights exported to {output_path}")
+
+
+if __name__ == "__main__":
+    main()
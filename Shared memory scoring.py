@@ -0,0 +1,245 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 17:21:09 2026
+
+@author: ericl
+"""
+
+import importlib.util
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+import pandas as pd
+
+"""
+Zero-copy multi-process role scoring. Instead of pickling the normalized player data to every worker, the arrays
+that role scoring needs are published once, either in shared memory or as memory-mapped .npy files:
+
+    metrics       normalized metric block, players x metrics
+    weights       role weight matrix, metrics x roles
+    adjustments   league adjustment matrix, leagues x metrics
+    league_codes  league of every player, as a row of the adjustment matrix
+    scores        output block, players x roles, that the workers write their results into
+
+A small manifest (a dict, saved as manifest.json for the .npy cache) describes where every array lives and its
+shape and dtype. Workers only receive the manifest and a row and role slice, attach to the arrays without copying
+them, and write the scores of their slice into the output block. For sensitivity runs, weight variants can be
+scored in one go by adding them to the role weight matrix as extra columns.
+"""
+
+# Turn the role dictionaries, adjustment factors and normalized data into the arrays used for scoring
+def build_scoring_arrays(normalized_df, roles, adjustment_factors):
+    """
+    Build the arrays for role scoring from the inputs of calculate_role_score_with_adjustments.
+
+    Parameters:
+        normalized_df (pd.DataFrame): The normalized player dataset, with a "League" column.
+        roles (dict): Dictionary defining roles and their associated metrics with weights.
+        adjustment_factors (dict of dict): Nested dictionary with league-specific adjustment factors for each metric.
+
+    Returns:
+        tuple: Dict of arrays, and dict of the metric, role and league names along the array axes.
+    """
+    if "League" not in normalized_df.columns:
+        raise ValueError("DataFrame must contain a 'League' column to apply league-specific adjustments.")
+
+    metrics = sorted({metric for role_weights in roles.values() for metric in role_weights})
+    role_names = list(roles)
+    league_codes, leagues = pd.factorize(normalized_df["League"])
+    if (league_codes < 0).any():
+        raise ValueError("Every player must have a league.")
+
+    weights = np.zeros((len(metrics), len(role_names)))
+    metric_idx = {metric: i for i, metric in enumerate(metrics)}
+    for j, role_weights in enumerate(roles.values()):
+        for metric, weight in role_weights.items():
+            weights[metric_idx[metric], j] = weight
+
+    # Leagues without adjustment factors (e.g. the baseline league) and missing metrics get a factor of 1
+    adjustments = np.array(
+        [[adjustment_factors.get(league, {}).get(metric, 1) for metric in metrics] for league in leagues], dtype=float
+    )
+
+    arrays = {
+        "metrics": normalized_df[metrics].to_numpy(dtype=float),
+        "weights": weights,
+        "adjustments": adjustments,
+        "league_codes": league_codes.astype(np.int64),
+        "scores": np.full((len(normalized_df), len(role_names)), np.nan),
+    }
+    labels = {"metrics": metrics, "roles": role_names, "leagues": [str(league) for league in leagues]}
+    return arrays, labels
+
+# Publish the arrays once, in shared memory or as memory-mapped .npy files
+def publish_arrays(arrays, labels, backend="shared_memory", cache_dir="scoring_cache"):
+    """
+    Copy the arrays into shared memory blocks or .npy files and describe them in a manifest.
+
+    Parameters:
+        arrays (dict): Arrays from build_scoring_arrays.
+        labels (dict): Names along the array axes from build_scoring_arrays.
+        backend (str): "shared_memory" or "mmap" (.npy files in cache_dir, which also outlive this process).
+        cache_dir (str): Directory for the .npy files and manifest.json when backend is "mmap".
+
+    Returns:
+        tuple: The manifest, and the shared memory blocks, which must be kept open while the workers run and be
+        released with release_arrays afterwards (an empty list for "mmap").
+    """
+    if backend not in ("shared_memory", "mmap"):
+        raise ValueError("backend must be 'shared_memory' or 'mmap'.")
+
+    manifest = {"backend": backend, "labels": labels, "arrays": {}}
+    blocks = []
+    for name, array in arrays.items():
+        entry = {"shape": list(array.shape), "dtype": array.dtype.str}
+        if backend == "shared_memory":
+            block = SharedMemory(create=True, size=max(array.nbytes, 1))
+            np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+            entry["name"] = block.name
+            blocks.append(block)
+        else:
+            os.makedirs(cache_dir, exist_ok=True)
+            entry["path"] = os.path.abspath(os.path.join(cache_dir, f"{name}.npy"))
+            np.save(entry["path"], array)
+        manifest["arrays"][name] = entry
+
+    if backend == "mmap":
+        with open(os.path.join(cache_dir, "manifest.json"), "w") as f:
+            json.dump(manifest, f)
+    return manifest, blocks
+
+# Attach to the published arrays without copying them
+def attach_arrays(manifest):
+    """
+    Get views of the published arrays. Only the output block "scores" is writable.
+
+    Parameters:
+        manifest (dict): Manifest from publish_arrays, or loaded from manifest.json.
+
+    Returns:
+        tuple: Dict of arrays, and the attached shared memory blocks, which must stay open while the arrays are used.
+    """
+    arrays, blocks = {}, []
+    for name, entry in manifest["arrays"].items():
+        mode = "r+" if name == "scores" else "r"
+        if manifest["backend"] == "mmap":
+            arrays[name] = np.load(entry["path"], mmap_mode=mode)
+            continue
+
+        block = SharedMemory(name=entry["name"])
+        array = np.ndarray(entry["shape"], dtype=np.dtype(entry["dtype"]), buffer=block.buf)
+        array.flags.writeable = mode == "r+"
+        arrays[name] = array
+        blocks.append(block)
+    return arrays, blocks
+
+# Free the shared memory blocks once all workers are done
+def release_arrays(blocks):
+    for block in blocks:
+        block.close()
+        block.unlink()
+
+# Worker: score a slice of players and roles and write it into the output block
+def score_slice(manifest, rows, roles=slice(None)):
+    """
+    Calculate league adjusted role scores for a slice of players and roles, like
+    calculate_role_score_with_adjustments, and write them into the shared output block.
+
+    Parameters:
+        manifest (dict): Manifest from publish_arrays.
+        rows (slice): Players to score.
+        roles (slice): Roles to score.
+
+    Returns:
+        int: Number of scores written.
+    """
+    arrays, blocks = attach_arrays(manifest)
+    try:
+        weights = arrays["weights"][:, roles]
+        adjusted = arrays["metrics"][rows] * arrays["adjustments"][arrays["league_codes"][rows]]
+
+        # A missing metric makes the score missing, but only for the roles that use the metric
+        missing = np.isnan(adjusted)
+        scores = np.where(missing, 0.0, adjusted) @ weights
+        scores[(missing.astype(float) @ (weights != 0)) > 0] = np.nan
+
+        arrays["scores"][rows, roles] = scores
+        if manifest["backend"] == "mmap":
+            arrays["scores"].flush()
+        return scores.size
+    finally:
+        del arrays
+        for block in blocks:
+            block.close()
+
+# Score all players in parallel on the published arrays
+def score_in_parallel(normalized_df, roles, adjustment_factors, n_jobs=None, row_slices=None, role_slices=1,
+                      backend="shared_memory", cache_dir="scoring_cache"):
+    """
+    Calculate league adjusted role scores with a pool of worker processes that share the input and output arrays.
+    The scores are the same as those of calculate_role_score_with_adjustments.
+
+    Parameters:
+        normalized_df (pd.DataFrame): The normalized player dataset, with a "League" column.
+        roles (dict): Dictionary defining roles and their associated metrics with weights.
+        adjustment_factors (dict of dict): Nested dictionary with league-specific adjustment factors for each metric.
+        n_jobs (int): Number of worker processes. Defaults to the number of CPUs.
+        row_slices (int): Number of player slices. Defaults to one per worker.
+        role_slices (int): Number of role slices.
+        backend (str): "shared_memory" or "mmap".
+        cache_dir (str): Directory for the .npy files when backend is "mmap".
+
+    Returns:
+        pd.DataFrame: One column per role, with the index of normalized_df.
+    """
+    n_jobs = n_jobs or os.cpu_count()
+    arrays, labels = build_scoring_arrays(normalized_df, roles, adjustment_factors)
+    manifest, blocks = publish_arrays(arrays, labels, backend, cache_dir)
+    del arrays
+
+    try:
+        n_players, n_roles = len(normalized_df), len(labels["roles"])
+        row_bounds = np.linspace(0, n_players, (row_slices or n_jobs) + 1, dtype=int)
+        role_bounds = np.linspace(0, n_roles, min(role_slices, n_roles) + 1, dtype=int)
+        tasks = [
+            (slice(row_start, row_end), slice(role_start, role_end))
+            for row_start, row_end in zip(row_bounds[:-1], row_bounds[1:]) if row_end > row_start
+            for role_start, role_end in zip(role_bounds[:-1], role_bounds[1:])
+        ]
+        with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+            list(executor.map(score_slice, [manifest] * len(tasks), *zip(*tasks)))
+
+        # Copy the scores out of the output block before it is released
+        entry = manifest["arrays"]["scores"]
+        if backend == "mmap":
+            scores = np.load(entry["path"])
+        else:
+            block = next(block for block in blocks if block.name == entry["name"])
+            scores = np.ndarray(entry["shape"], dtype=np.dtype(entry["dtype"]), buffer=block.buf).copy()
+    finally:
+        release_arrays(blocks)
+
+    return pd.DataFrame(scores, columns=labels["roles"], index=normalized_df.index)
+
+#%%
+# Usage
+
+if __name__ == "__main__":
+    # Load the functions and roles of the all leagues role ranking
+    role_ranking_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Role ranking all leagues.py")
+    spec = importlib.util.spec_from_file_location("role_ranking_all_leagues", role_ranking_path)
+    role_ranking = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(role_ranking)
+
+    outfield_player_data = pd.read_excel("Outfield player data.xlsx")
+    df_league_metrics = pd.read_excel("Average league data.xlsx")
+    adjustment_factors = role_ranking.calculate_adjustment_factors(df_league_metrics, "Mean")
+    normalized_outfield_data = role_ranking.normalize_data(outfield_player_data, role_ranking.roles_outfield)
+
+    # Score all players on all cores, sharing one copy of the data between the workers
+    role_scores = score_in_parallel(normalized_outfield_data, role_ranking.roles_outfield, adjustment_factors)
+    outfield_role_scores = pd.concat([outfield_player_data[["Player", "League", "Squad", "Pos", "Mins"]], role_scores], axis=1)
+    outfield_role_scores.to_excel("outfield_role_scores_parallel.xlsx", index=False)
@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 13:40:18 2026
+
+@author: ericl
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from scipy.optimize import linear_sum_assignment
+
+"""
+Optimal assignment of squad members to the roles of a formation. The role score tables give every player a score
+for every role; for a formation template (a list of roles, one per position, e.g. from roles_outfield plus the GK
+role) this finds, for every squad, the one-to-one assignment of players to positions with the highest total role
+score. Each squad is a linear assignment problem on its player x position score matrix. The squads of all leagues
+are solved in batches spread over several processes.
+"""
+
+# Score given to combinations that are not allowed (e.g. an outfield player in goal), low enough to never be chosen
+FORBIDDEN_SCORE = -1e9
+
+# Build the player x position score matrix of every squad
+def build_squad_matrices(outfield_scores, gk_scores, formation, min_minutes=0):
+    """
+    Build a score matrix for every squad, with one row per player and one column per position of the formation.
+    Outfield players can only fill outfield roles and goalkeepers only goalkeeper roles.
+
+    Parameters:
+        outfield_scores (pd.DataFrame): Outfield role scores with "Player", "League", "Squad" and one column per role.
+        gk_scores (pd.DataFrame): Goalkeeper role scores with the same metadata columns.
+        formation (list): Roles of the formation, one per position. A role can be used more than once.
+        min_minutes (int): Players with fewer minutes are left out.
+
+    Returns:
+        list: Tuples of ((league, squad), players, score matrix), one per squad.
+    """
+    outfield_roles = [role for role in formation if role in outfield_scores.columns]
+    gk_roles = [role for role in formation if role in gk_scores.columns]
+    unknown_roles = [role for role in formation if role not in outfield_roles + gk_roles]
+    if unknown_roles:
+        raise ValueError(f"Roles in formation not found in the role scores: {unknown_roles}")
+
+    # One table with a column per position, where roles a player cannot fill get the forbidden score
+    positions = [f"{i}_{role}" for i, role in enumerate(formation)]
+    pools = []
+    for scores, pool_roles in [(outfield_scores, outfield_roles), (gk_scores, gk_roles)]:
+        eligible = scores["Mins"] >= min_minutes if "Mins" in scores.columns else slice(None)
+        pool = scores.loc[eligible, ["Player", "League", "Squad"]].copy()
+        for position, role in zip(positions, formation):
+            pool[position] = scores.loc[pool.index, role] if role in pool_roles else np.nan
+        pools.append(pool)
+    players = pd.concat(pools, ignore_index=True)
+    players[positions] = players[positions].astype(float).fillna(FORBIDDEN_SCORE)
+
+    return [
+        (squad, squad_players["Player"].to_numpy(), squad_players[positions].to_numpy())
+        for squad, squad_players in players.groupby(["League", "Squad"], sort=True)
+    ]
+
+# Solve the assignment problems of a batch of squads
+def _solve_batch(batch):
+    solutions = []
+    for squad, players, scores in batch:
+        player_idx, position_idx = linear_sum_assignment(scores, maximize=True)
+        allowed = scores[player_idx, position_idx] > FORBIDDEN_SCORE
+        solutions.append((squad, players[player_idx[allowed]], position_idx[allowed], scores[player_idx[allowed], position_idx[allowed]]))
+    return solutions
+
+# Assign the players of every squad to the positions of a formation
+def assign_roles(outfield_scores, gk_scores, formation, min_minutes=0, n_jobs=None, batch_size=200):
+    """
+    Find the optimal one-to-one assignment of players to the positions of a formation for every squad in the
+    role score tables. Positions that cannot be filled (e.g. a squad without a goalkeeper) are left empty.
+
+    Parameters:
+        outfield_scores (pd.DataFrame): Outfield role scores, e.g. outfield_role_scores_with_adjustments.xlsx.
+        gk_scores (pd.DataFrame): Goalkeeper role scores, e.g. gk_role_scores_with_adjustments.xlsx.
+        formation (list): Roles of the formation, one per position.
+        min_minutes (int): Players with fewer minutes are left out.
+        n_jobs (int): Number of worker processes. Defaults to the number of CPUs, 1 solves in this process.
+        batch_size (int): Number of squads solved per task.
+
+    Returns:
+        pd.DataFrame: One row per squad and position with the assigned player and their role score.
+    """
+    squads = build_squad_matrices(outfield_scores, gk_scores, formation, min_minutes)
+    batches = [squads[i:i + batch_size] for i in range(0, len(squads), batch_size)]
+
+    n_jobs = n_jobs or os.cpu_count()
+    if n_jobs == 1 or len(batches) == 1:
+        solutions = map(_solve_batch, batches)
+    else:
+        with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+            solutions = list(executor.map(_solve_batch, batches))
+
+    # Collect the filled positions of all squads, then add the empty positions back with a single merge
+    squads_solved, filled = [], {"League": [], "Squad": [], "Position": [], "Player": [], "Score": []}
+    for (league, squad), players, position_idx, scores in (solution for batch in solutions for solution in batch):
+        squads_solved.append((league, squad))
+        filled["League"].extend([league] * len(players))
+        filled["Squad"].extend([squad] * len(players))
+        filled["Position"].extend(position_idx)
+        filled["Player"].extend(players)
+        filled["Score"].extend(scores)
+
+    grid = pd.DataFrame(
+        [(league, squad, position, role) for league, squad in squads_solved for position, role in enumerate(formation)],
+        columns=["League", "Squad", "Position", "Role"],
+    )
+    return grid.merge(pd.DataFrame(filled), on=["League", "Squad", "Position"], how="left")
+
+#%%
+# Usage
+
+if __name__ == "__main__":
+    # Role scores for all leagues, from Role ranking all leagues.py
+    outfield_role_scores = pd.read_excel("outfield_role_scores_with_adjustments.xlsx")
+    gk_role_scores = pd.read_excel("gk_role_scores_with_adjustments.xlsx")
+
+    # Formation template, one role per position
+    formation = [
+        "Shot stopping distributor",
+        "Attacking FB", "Ball playing CB", "Defensive CB", "Inverted FB",
+        "Number 6", "Deep lying playmaker", "Advanced playmaker",
+        "Inverted winger", "Target striker", "Traditional winger",
+    ]
+
+    assignments = assign_roles(outfield_role_scores, gk_role_scores, formation, min_minutes=450)
+
+    # Total role score of the best eleven of every squad
+    squad_totals = assignments.groupby(["League", "Squad"])["Score"].sum().sort_values(ascending=False)
+    print(squad_totals.head(20))
+
+    assignments.to_excel("squad_role_assignments.xlsx", index=False)
@@ -0,0 +1,254 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 18:03:52 2026
+
+@author: ericl
+"""
+
+import importlib.util
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+"""
+Clustering of teams by playing style. Every team gets a feature vector with its average FTPI components (offensive
+output, compactness factor and FTPI) and the minutes-weighted average role scores of its squad, both built with
+grouped reductions. The features are standardized and clustered with mini-batch k-means, where all restarts are run
+at once as one batch of arrays (restarts x clusters x features). The fitted model holds the centroids and the
+standardization, and can be saved as JSON, so new teams can be assigned to the clusters later, and optionally used
+to update the centroids.
+"""
+
+FTPI_COLUMNS = ["Offensive output", "Compactness factor", "FTPI"]
+
+# Build one feature vector per team from the FTPI results and the role scores
+def build_team_features(ftpi_data, role_scores, roles, team_keys=("League", "Squad"), ftpi_team_keys=None,
+                        minutes_column="Mins"):
+    """
+    Build team features from match-level FTPI results and player-level role scores.
+
+    Parameters:
+        ftpi_data (pd.DataFrame): FTPI results per match (e.g. final_data.xlsx), with the team key columns.
+        role_scores (pd.DataFrame): Role scores per player, with the team key columns and minutes played.
+        roles (list): Role score columns to include in the squad profile.
+        team_keys (tuple): Columns identifying a team in the role scores (e.g. League, Season and Squad).
+        ftpi_team_keys (tuple): Columns identifying a team in the FTPI results, in the same order as team_keys, if
+            they are named differently. A dataset built with Event aggregation.py has a "team" column, which
+            matches ("Squad",) when the event data uses the same team names as the player data. Defaults to
+            team_keys.
+        minutes_column (str): Column with minutes played, used to weight the role scores.
+
+    Returns:
+        pd.DataFrame: One row per team, indexed by the team keys, with the FTPI and role score features.
+    """
+    team_keys = list(team_keys)
+    ftpi_team_keys = list(ftpi_team_keys or team_keys)
+    if len(ftpi_team_keys) != len(team_keys):
+        raise ValueError("ftpi_team_keys must have one column for every column of team_keys.")
+
+    # Average FTPI components over the matches of every team
+    ftpi_features = ftpi_data.groupby(ftpi_team_keys)[FTPI_COLUMNS].mean()
+    ftpi_features.index.names = team_keys
+
+    # Minutes-weighted average role scores of every squad, as sums of score x minutes divided by the minutes of the
+    # players with a score, so a missing score (e.g. G/Sh without shots) does not pull the average towards 0
+    minutes = role_scores[minutes_column].fillna(0)
+    groups = [role_scores[key] for key in team_keys]
+    weighted_sums = role_scores[roles].mul(minutes, axis=0).groupby(groups).sum()
+    scored_minutes = role_scores[roles].notna().mul(minutes, axis=0).groupby(groups).sum()
+    role_features = weighted_sums / scored_minutes.where(scored_minutes > 0)
+
+    return ftpi_features.join(role_features, how="inner")
+
+# Squared distances between points and centroids, for every restart at once
+def _squared_distances(points, centroids):
+    # points: (n, d), centroids: (r, k, d) -> (r, n, k)
+    cross = np.einsum("nd,rkd->rnk", points, centroids)
+    return (points ** 2).sum(axis=-1)[..., None] - 2 * cross + (centroids ** 2).sum(axis=-1)[:, None, :]
+
+# k-means++ initialization, for every restart at once
+def _init_centroids(X, n_clusters, n_init, rng):
+    centroids = np.empty((n_init, n_clusters, X.shape[1]))
+    centroids[:, 0] = X[rng.integers(len(X), size=n_init)]
+    closest = _squared_distances(X, centroids[:, :1])[..., 0].clip(min=0)
+    for c in range(1, n_clusters):
+        # Pick the next centroid with probability proportional to the squared distance to the closest centroid
+        probabilities = closest / closest.sum(axis=1, keepdims=True)
+        picks = (probabilities.cumsum(axis=1) < rng.random((n_init, 1))).sum(axis=1).clip(max=len(X) - 1)
+        centroids[:, c] = X[picks]
+        closest = np.minimum(closest, _squared_distances(X, centroids[:, c:c + 1])[..., 0].clip(min=0))
+    return centroids
+
+# Mini-batch update of the centroids: every centroid moves to the running mean of the points assigned to it
+def _update_centroids(centroids, counts, batch, labels):
+    n_init, n_clusters, n_features = centroids.shape
+    flat_labels = (np.arange(n_init)[:, None] * n_clusters + labels).ravel()
+    batch_counts = np.bincount(flat_labels, minlength=n_init * n_clusters).reshape(n_init, n_clusters)
+    batch_sums = np.zeros((n_init * n_clusters, n_features))
+    np.add.at(batch_sums, flat_labels, np.broadcast_to(batch, (n_init,) + batch.shape).reshape(-1, n_features))
+    batch_sums = batch_sums.reshape(n_init, n_clusters, n_features)
+
+    new_counts = counts + batch_counts
+    moved = batch_counts > 0
+    centroids[moved] = (centroids[moved] * counts[moved][:, None] + batch_sums[moved]) / new_counts[moved][:, None]
+    return centroids, new_counts
+
+# Cluster the teams with mini-batch k-means and multiple restarts
+def cluster_teams(features, n_clusters=6, n_init=10, batch_size=1024, max_iter=100, random_state=0):
+    """
+    Cluster teams by style with mini-batch k-means. All restarts are run side by side, and the one with the lowest
+    inertia (sum of squared distances to the closest centroid) is kept.
+
+    Parameters:
+        features (pd.DataFrame): Team features from build_team_features.
+        n_clusters (int): Number of clusters.
+        n_init (int): Number of restarts with different initial centroids.
+        batch_size (int): Number of teams per mini-batch. All teams are used in every step if there are fewer.
+        max_iter (int): Number of mini-batch steps.
+        random_state (int): Seed for the initialization and the mini-batches.
+
+    Returns:
+        tuple: Cluster of every team (pd.Series), and the model: a dict with the centroids in feature units, the
+        standardization ("mean", "std") and the number of teams per cluster ("counts").
+    """
+    features = features.dropna()
+    if len(features) < n_clusters:
+        raise ValueError("There must be at least as many teams as clusters.")
+
+    # Standardize so that FTPI components and role scores weigh the same
+    mean, std = features.mean(), features.std(ddof=0).replace(0, 1)
+    X = ((features - mean) / std).to_numpy()
+    rng = np.random.default_rng(random_state)
+
+    centroids = _init_centroids(X, n_clusters, n_init, rng)
+    counts = np.zeros((n_init, n_clusters))
+    for _ in range(max_iter):
+        batch = X if len(X) <= batch_size else X[rng.choice(len(X), size=batch_size, replace=False)]
+        labels = _squared_distances(batch, centroids).argmin(axis=2)
+        centroids, counts = _update_centroids(centroids, counts, batch, labels)
+
+    # Keep the restart with the lowest inertia on all teams
+    distances = _squared_distances(X, centroids)
+    best = distances.min(axis=2).sum(axis=1).argmin()
+    labels = distances[best].argmin(axis=1)
+
+    model = {
+        "centroids": pd.DataFrame(centroids[best] * std.to_numpy() + mean.to_numpy(), columns=features.columns),
+        "mean": mean,
+        "std": std,
+        "counts": np.bincount(labels, minlength=n_clusters).astype(float),
+    }
+    return pd.Series(labels, index=features.index, name="Cluster"), model
+
+# Assign new teams to the clusters of a fitted model
+def assign_teams(model, features, update=False):
+    """
+    Assign teams to the nearest centroid of a fitted model.
+
+    Parameters:
+        model (dict): Model from cluster_teams.
+        features (pd.DataFrame): Team features from build_team_features, with the same columns as the model.
+        update (bool): Also move the centroids towards the new teams, like one mini-batch step. The model is updated
+            in place.
+
+    Returns:
+        pd.Series: Cluster of every team.
+    """
+    columns = model["centroids"].columns
+    features = features[columns].dropna()
+    X = ((features - model["mean"]) / model["std"]).to_numpy()
+    centroids = ((model["centroids"] - model["mean"]) / model["std"]).to_numpy(dtype=float, copy=True)[None]
+
+    labels = _squared_distances(X, centroids)[0].argmin(axis=1)
+    if update:
+        centroids, counts = _update_centroids(centroids, model["counts"][None], X, labels[None])
+        model["centroids"] = pd.DataFrame(centroids[0] * model["std"].to_numpy() + model["mean"].to_numpy(), columns=columns)
+        model["counts"] = counts[0]
+
+    return pd.Series(labels, index=features.index, name="Cluster")
+
+# Save a fitted model, so teams can be assigned to its clusters in a later run
+def save_model(model, path):
+    """
+    Save a model from cluster_teams as JSON: centroids, standardization and cluster counts.
+
+    Parameters:
+        model (dict): Model from cluster_teams.
+        path (str): Path of the JSON file.
+    """
+    with open(path, "w") as f:
+        json.dump({
+            "columns": list(model["centroids"].columns),
+            "centroids": model["centroids"].to_numpy().tolist(),
+            "mean": model["mean"].tolist(),
+            "std": model["std"].tolist(),
+            "counts": np.asarray(model["counts"]).tolist(),
+        }, f, indent=4)
+
+# Load a model saved with save_model
+def load_model(path):
+    """
+    Load a model saved with save_model.
+
+    Parameters:
+        path (str): Path of the JSON file.
+
+    Returns:
+        dict: Model in the format of cluster_teams, for assign_teams.
+    """
+    with open(path) as f:
+        saved = json.load(f)
+    columns = saved["columns"]
+    return {
+        "centroids": pd.DataFrame(saved["centroids"], columns=columns),
+        "mean": pd.Series(saved["mean"], index=columns),
+        "std": pd.Series(saved["std"], index=columns),
+        "counts": np.array(saved["counts"], dtype=float),
+    }
+
+#%%
+# Usage
+
+def main(ftpi_path="final_data.xlsx", role_scores_path="outfield_role_scores_with_adjustments.xlsx",
+         output_path="team_style_clusters.xlsx", model_path="team_style_model.json", n_clusters=6):
+    """
+    Cluster the teams by style, export the clusters and centroids, and save the model for assign_teams.
+
+    Parameters:
+        ftpi_path (str): FTPI results per match from FTPI calculation.py, with the "team" column of the dataset
+            from Event aggregation.py.
+        role_scores_path (str): Role scores per player from Role ranking all leagues.py, with a "Squad" column.
+        output_path (str): Excel file the clusters and centroids are written to.
+        model_path (str): JSON file the model is saved to.
+        n_clusters (int): Number of clusters.
+    """
+    # Role names from the all leagues role ranking
+    role_ranking_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Role ranking all leagues.py")
+    spec = importlib.util.spec_from_file_location("role_ranking_all_leagues", role_ranking_path)
+    role_ranking = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(role_ranking)
+
+    # FTPI results per match and role scores per player. The teams are matched on the team name, so the event data
+    # and the player data should use the same names.
+    ftpi_data = pd.read_excel(ftpi_path)
+    outfield_role_scores = pd.read_excel(role_scores_path)
+
+    team_features = build_team_features(ftpi_data, outfield_role_scores, list(role_ranking.roles_outfield),
+                                        team_keys=("Squad",), ftpi_team_keys=("team",))
+    clusters, model = cluster_teams(team_features, n_clusters=n_clusters)
+
+    # Export the clusters of every team and the centroids, which describe the style of each cluster
+    with pd.ExcelWriter(output_path) as writer:
+        team_features.join(clusters).to_excel(writer, sheet_name="Teams")
+        model["centroids"].to_excel(writer, sheet_name="Centroids", index_label="Cluster")
+
+    # Save the model, so new teams can be assigned with load_model and assign_teams
+    save_model(model, model_path)
+
+    print(f"Team style clusters exported to {output_path}, model saved to {model_path}")
+
+
+if __name__ == "__main__":
+    main()